@@ -1,13 +1,85 @@
 import streamlit as st
-import requests
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+from PIL import Image
+import os
+import threading
 import time
-import urllib.parse
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils import render
+from utils.backends import BACKENDS, ProceduralBackend, hedge, make_backend
+from utils.bundle import bundle_bytes, bundle_units
+from utils.captions import CAPTION_TYPES, caption_ideas
+from utils.export import ExportCache, encode_variant
+from utils.http_client import ImageHttpClient
+from utils.image_cache import DEFAULT_CACHE_DIR, ImageCache
+from utils.library import DEFAULT_LIBRARY_DIR, DesignLibrary
+from utils.metrics import end_trace, registry, span, start_trace
+from utils.singleflight import SingleFlight
+from utils.presets import SIZE_PRESETS, is_large_format, is_print_size, preview_size
+from utils.profiler import current_rerun, end_rerun, start_rerun
+from utils.prompts import PURPOSES, STYLE_NAMES, enhance_prompt
+from utils.scheduler import GenerationScheduler, ScheduledClient, SchedulerBusy
+from utils.session_memory import SessionMemory
+from utils.templates import DEFAULT_TEMPLATE_DIR, TEMPLATE_CATEGORIES, TemplateWarmer
+from utils.variations import generate_variations, random_seeds
+
+# Image backend settings (cache is shared by all sessions)
+IMAGE_CACHE_DIR = os.environ.get("MEME_IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+IMAGE_CACHE_MAX_MB = int(os.environ.get("MEME_IMAGE_CACHE_MAX_MB", "512"))
+IMAGE_MAX_DOWNLOAD_MB = int(os.environ.get("MEME_IMAGE_MAX_DOWNLOAD_MB", "25"))
+
+# Upstream generation scheduler (shared by all sessions)
+GEN_MAX_CONCURRENCY = int(os.environ.get("MEME_GEN_MAX_CONCURRENCY", "4"))
+GEN_RATE_PER_SEC = float(os.environ.get("MEME_GEN_RATE_PER_SEC", "2"))
+GEN_BURST = int(os.environ.get("MEME_GEN_BURST", "4"))
+GEN_MAX_QUEUE = int(os.environ.get("MEME_GEN_MAX_QUEUE", "32"))
+GEN_MAX_PER_SESSION = int(os.environ.get("MEME_GEN_MAX_PER_SESSION", "4"))
+GEN_QUEUE_TIMEOUT = float(os.environ.get("MEME_GEN_QUEUE_TIMEOUT", "90"))
+
+# Generation backend, and how long to wait for it before serving a local background
+GEN_BACKEND = os.environ.get("MEME_GEN_BACKEND", "pollinations")
+if GEN_BACKEND not in BACKENDS:
+    raise ValueError(f"MEME_GEN_BACKEND must be one of {', '.join(BACKENDS)}")
+GEN_LATENCY_BUDGET = float(os.environ.get("MEME_GEN_LATENCY_BUDGET", "20"))
+
+# Persistent design library (SQLite index + blob store)
+LIBRARY_DIR = os.environ.get("MEME_LIBRARY_DIR", DEFAULT_LIBRARY_DIR)
+LIBRARY_PAGE_SIZE = 9
+
+# Files per design in a ZIP bundle (every platform size and format)
+BUNDLE_FILES = sum(len(files) for _, files in bundle_units())
+# A bundle reaches the browser as one in-memory download, so its size is capped
+BUNDLE_MAX_DESIGNS = int(os.environ.get("MEME_BUNDLE_MAX_DESIGNS", "10"))
+
+# Memory for the last design's layers and result, per session and across all sessions
+SESSION_MEMORY_MB = int(os.environ.get("MEME_SESSION_MEMORY_MB", "128"))
+SESSION_MEMORY_GLOBAL_MB = int(os.environ.get("MEME_SESSION_MEMORY_GLOBAL_MB", "1024"))
+
+# Largest side of the on-page preview (downloads stay full resolution)
+DISPLAY_MAX_SIDE = 1600
+VARIATION_MAX_SIDE = 800
+
+# Script time allowed per interaction; slower reruns are flagged (0 disables the check)
+RERUN_BUDGET_MS = int(os.environ.get("MEME_RERUN_BUDGET_MS", "300"))
+
+# Template gallery pre-rendering
+TEMPLATE_DIR = os.environ.get("MEME_TEMPLATE_DIR", DEFAULT_TEMPLATE_DIR)
+TEMPLATE_WARMUP = os.environ.get("MEME_TEMPLATE_WARMUP", "1") != "0"
+
+# Optional Prometheus textfile written after every render
+METRICS_FILE = os.environ.get("MEME_METRICS_FILE")
 
 # --- Page Setup ---
 st.set_page_config(page_title="Student Meme & Poster Creator", page_icon="🎓", layout="wide")
 
+# Profile this run, from here to the debug panel
+rerun = start_rerun("app")
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -46,39 +118,156 @@ st.markdown('''
 </div>
 ''', unsafe_allow_html=True)
 
+@st.cache_resource
+def get_image_cache():
+    """Process-wide on-disk cache of raw Pollinations images"""
+    return ImageCache(IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_http_client():
+    """Process-wide keep-alive client for the image backend"""
+    return ImageHttpClient(connect_timeout=5, read_timeout=30, max_bytes=IMAGE_MAX_DOWNLOAD_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_image_flights():
+    """Process-wide coalescing of identical base image requests across sessions"""
+    return SingleFlight("base_image")
+
+@st.cache_resource
+def get_generation_scheduler():
+    """Process-wide rate limit, concurrency cap and fair queue for upstream calls"""
+    return GenerationScheduler(
+        max_concurrency=GEN_MAX_CONCURRENCY,
+        rate=GEN_RATE_PER_SEC,
+        burst=GEN_BURST,
+        max_queue=GEN_MAX_QUEUE,
+        max_per_session=GEN_MAX_PER_SESSION,
+        queue_timeout=GEN_QUEUE_TIMEOUT,
+    )
+
+@st.cache_resource
+def get_local_backend():
+    """Deterministic procedural backgrounds, used when the backend is too slow"""
+    return ProceduralBackend()
+
+@st.cache_resource
+def get_export_cache():
+    """Process-wide memo of encoded download variants"""
+    return ExportCache()
+
+@st.cache_resource
+def get_session_memory():
+    """Process-wide, byte-budgeted store for each session's design layers and result"""
+    return SessionMemory(SESSION_MEMORY_MB * 1024 * 1024, SESSION_MEMORY_GLOBAL_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_design_library():
+    """Process-wide handle on the persistent design library"""
+    return DesignLibrary(LIBRARY_DIR)
+
+@st.cache_resource
+def get_template_warmer():
+    """Process-wide template pre-renderer (starts one background refresh)"""
+    client = ScheduledClient(get_http_client(), get_generation_scheduler(), "template-warmup")
+    warmer = TemplateWarmer(get_image_cache(), client, TEMPLATE_DIR)
+    # Only cached backends gain anything: a local one renders templates on demand without the network
+    if TEMPLATE_WARMUP and make_backend(GEN_BACKEND, client).cacheable:
+        warmer.start()
+    return warmer
+
+TAB_LABELS = ("🎨 Create", "📋 Templates", "💾 My Designs", "💡 AI Caption Generator")
+
+def use_template(name, template_prompt):
+    """Template button callback: load the prompt into the Create tab and switch to it"""
+    st.session_state.prompt_text = template_prompt
+    st.session_state.template_name = name
+    st.session_state.active_template = (name, template_prompt)
+    st.session_state.main_tab = TAB_LABELS[0]
+
+def reset_library_page():
+    st.session_state.library_page = 0
+
+def change_library_page(step):
+    st.session_state.library_page += step
+
+def clear_library():
+    get_design_library().clear(library_owner)
+    st.session_state.library_page = 0
+    clear_bundle_selection()
+
+def delete_saved_design(design_id):
+    get_design_library().delete(library_owner, design_id)
+    st.session_state.bundle_selection.discard(design_id)
+
+def toggle_bundle_selection(design_id):
+    """Checkbox callback: keep the bundle selection across gallery pages"""
+    if st.session_state[f"select_saved_{design_id}"]:
+        st.session_state.bundle_selection.add(design_id)
+    else:
+        st.session_state.bundle_selection.discard(design_id)
+
+def clear_bundle_selection():
+    for design_id in st.session_state.bundle_selection:
+        st.session_state.pop(f"select_saved_{design_id}", None)
+    st.session_state.bundle_selection.clear()
+
+def finish_rerun(profile):
+    """Record a finished run in the process metrics and this session's debug panel"""
+    end_rerun(profile, RERUN_BUDGET_MS / 1000 if RERUN_BUDGET_MS > 0 else None)
+    st.session_state.reruns.append(profile.as_dict())
+
+@contextmanager
+def profiled(name):
+    """Time part of the page: a section of this run, or a run of its own when a fragment reruns alone"""
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        profile = start_rerun(f"fragment:{name}")
+        try:
+            yield profile
+        finally:
+            finish_rerun(profile)
+    else:
+        with rerun.section(name) as profile:
+            yield profile
+
 # Initialize session state
-if 'history' not in st.session_state:
-    st.session_state.history = []
-if 'current_image' not in st.session_state:
-    st.session_state.current_image = None
 if 'saved_designs' not in st.session_state:
     st.session_state.saved_designs = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+# The library is keyed by a token in the URL, so a bookmark brings designs back
+if 'library_owner' not in st.session_state:
+    token = st.query_params.get("library", "")
+    st.session_state.library_owner = token if token.isalnum() and len(token) <= 64 else uuid.uuid4().hex
+library_owner = st.session_state.library_owner
+st.query_params["library"] = library_owner
+if 'library_page' not in st.session_state:
+    st.session_state.library_page = 0
+if 'bundle_selection' not in st.session_state:
+    st.session_state.bundle_selection = set()
+if 'reruns' not in st.session_state:
+    st.session_state.reruns = deque(maxlen=20)
+# Template previews start warming on the first visit, not when the gallery is first opened
+get_template_warmer()
+# Tabs that aren't open are not built, so keep their widget values as plain state
+for key in ("library_query", "caption_type", "caption_context"):
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
 
 # Sidebar
-with st.sidebar:
+with st.sidebar, rerun.section("sidebar"):
     st.header("⚙️ Design Settings")
     
     # Purpose selector
     st.subheader("🎯 What are you creating?")
-    purpose = st.selectbox(
-        "Select Purpose",
-        ["College Event Poster", "Social Media Post", "Meme", "Announcement", "Workshop/Seminar", "Club Activity", "Motivational Poster", "Custom"],
-        index=0
-    )
+    purpose = st.selectbox("Select Purpose", PURPOSES, index=0)
     
     # Image settings
     st.subheader("📐 Size & Format")
     
     # Preset sizes for different platforms
-    size_presets = {
-        "Instagram Post (1:1)": (1080, 1080),
-        "Instagram Story": (1080, 1920),
-        "Facebook Post": (1200, 630),
-        "Twitter Post": (1200, 675),
-        "A4 Poster": (2480, 3508),
-        "A3 Poster": (3508, 4961),
-        "Custom": (1024, 1024)
-    }
+    size_presets = SIZE_PRESETS
     
     size_preset = st.selectbox("Size Preset", list(size_presets.keys()), index=0)
     
@@ -92,13 +281,15 @@ with st.sidebar:
         width, height = size_presets[size_preset]
         st.info(f"📏 Size: {width}x{height}px")
     
-    # Style
-    art_style = st.selectbox(
-        "Visual Style",
-        ["Modern Minimal", "Bold & Colorful", "Professional", "Vintage Retro", "Cyberpunk", "Anime", "Cartoon", "3D Render", "Realistic Photo"],
-        index=0
+    progressive_preview = st.checkbox(
+        "⚡ Fast preview for print sizes",
+        value=True,
+        help="Show a quick low-resolution preview first, then swap in the full render when it's ready"
     )
     
+    # Style
+    art_style = st.selectbox("Visual Style", STYLE_NAMES, index=0)
+    
     # Text settings
     st.subheader("✍️ Text Options")
     text_position = st.radio("Text Position", ["Top", "Bottom", "Center", "Top & Bottom", "None"], index=0)
@@ -109,6 +300,8 @@ with st.sidebar:
         text_color = st.color_picker("Text Color", "#FFFFFF")
     with col2:
         outline_color = st.color_picker("Outline", "#000000")
+    outline_width = st.slider("Outline Width", 0, 10, 3)
+    text_shadow = st.checkbox("Soft Shadow", help="Adds a blurred drop shadow behind the text")
     
     # Effects
     st.subheader("✨ Visual Effects")
@@ -117,11 +310,163 @@ with st.sidebar:
         brightness = st.slider("Brightness", 0.5, 1.5, 1.0, 0.1)
         contrast = st.slider("Contrast", 0.5, 1.5, 1.0, 0.1)
         saturation = st.slider("Saturation", 0.5, 1.5, 1.0, 0.1)
+        hue_shift = st.slider("Hue Shift", -180, 180, 0, 5)
+        gamma = st.slider("Gamma", 0.5, 2.0, 1.0, 0.1)
+        vignette = st.slider("Vignette", 0.0, 1.0, 0.0, 0.1)
+    
+    # Debug
+    st.subheader("🛠️ Debug")
+    show_debug = st.checkbox("Show timing breakdown", help="Per-stage timings for the last render, per-rerun script timings and process-wide metrics")
+
+# Tabs other than Create are fragments, built only while open
+@st.fragment
+def templates_tab(size_preset, art_style):
+    """Template gallery, built only while its tab is open"""
+    with profiled("templates"):
+        st.subheader("📋 Ready-to-Use Templates")
+        st.write("Click any template to customize it for your needs!")
+        
+        # Categorized templates (pre-rendered in the background)
+        warmer = get_template_warmer()
+        warmup = warmer.status()
+        if warmup['running']:
+            st.caption(f"🔥 Preparing template previews... {warmup['done']}/{warmup['total']}")
+        st.caption(f"⚡ Templates marked with a bolt are ready instantly at {size_preset} in {art_style} style.")
+        
+        for category, templates in TEMPLATE_CATEGORIES.items():
+            with st.expander(category, expanded=True):
+                cols = st.columns(2)
+                for idx, (name, template_prompt) in enumerate(templates.items()):
+                    with cols[idx % 2]:
+                        thumbnail = warmer.thumbnail(name, size_preset, art_style) or warmer.any_thumbnail(name)
+                        if thumbnail:
+                            st.image(thumbnail, use_container_width=True)
+                        icon = "⚡" if warmer.is_warm(name, size_preset, art_style) else "📌"
+                        if st.button(f"{icon} {name}", key=f"template_{category}_{name}", use_container_width=True,
+                                     on_click=use_template, args=(name, template_prompt)):
+                            # The prompt box is in the Create tab, outside this fragment
+                            st.rerun()
+
+@st.fragment
+def library_tab():
+    """Saved designs; searching, paging, selecting and deleting rerun only this tab"""
+    with profiled("library"):
+        st.subheader("💾 My Saved Designs")
+        library = get_design_library()
+        
+        col_f1, col_f2 = st.columns([3, 1])
+        with col_f1:
+            query = st.text_input("🔍 Search by prompt or template", key="library_query",
+                                  placeholder="e.g. hackathon, Tech Fest", on_change=reset_library_page)
+        total = library.count(library_owner, query)
+        
+        if total:
+            with col_f2:
+                st.write("")
+                st.button("🗑️ Clear All", on_click=clear_library, use_container_width=True)
+            
+            pages = (total + LIBRARY_PAGE_SIZE - 1) // LIBRARY_PAGE_SIZE
+            page = st.session_state.library_page = min(st.session_state.library_page, pages - 1)
+            plural = "s" if total != 1 else ""
+            st.write(f"**{total} saved design{plural}**" if not query else f"**{total} design{plural} match{'es' if total == 1 else ''} “{query}”**")
+            st.caption("🔖 Bookmark this page's address to come back to your designs later.")
+            
+            # Campaign bundle: every platform size and format of the selected designs
+            selection = st.session_state.bundle_selection
+            if selection:
+                col_b1, col_b2 = st.columns([3, 1])
+                with col_b1:
+                    if len(selection) > BUNDLE_MAX_DESIGNS:
+                        st.warning(f"📦 A bundle holds up to {BUNDLE_MAX_DESIGNS} designs - untick "
+                                   f"{len(selection) - BUNDLE_MAX_DESIGNS} to download.")
+                    st.download_button(
+                        f"📦 Download bundle: {len(selection)} designs × {BUNDLE_FILES} files (ZIP)",
+                        lambda ids=tuple(selection): bundle_bytes(
+                            (f"{entry['id']:04d} {entry['template'] or entry['prompt']}",
+                             lambda entry=entry: library.load_image(entry))
+                            for entry in library.entries(library_owner, ids)
+                        ),
+                        "designs_bundle.zip", "application/zip", on_click="ignore", use_container_width=True,
+                        disabled=len(selection) > BUNDLE_MAX_DESIGNS
+                    )
+                with col_b2:
+                    st.button("✖️ Clear selection", on_click=clear_bundle_selection, use_container_width=True)
+            else:
+                st.caption(f"☑️ Tick designs to download them as one ZIP in every size and format ({BUNDLE_FILES} files each).")
+            
+            # Only the visible page is read from the library
+            cols = st.columns(3)
+            for idx, entry in enumerate(library.page(library_owner, page, LIBRARY_PAGE_SIZE, query)):
+                with cols[idx % 3]:
+                    try:
+                        st.image(library.thumbnail(entry), use_container_width=True)
+                    except FileNotFoundError:
+                        st.warning("🖼️ Preview missing")
+                    label = entry['template'] or entry['prompt'][:40] or "Untitled"
+                    st.caption(f"**{label}** · {entry['style'] or ''} · "
+                               f"🕐 {time.strftime('%d %b, %I:%M %p', time.localtime(entry['created']))}")
+                    
+                    col_i1, col_i2 = st.columns([3, 1])
+                    with col_i1:
+                        st.download_button(
+                            "⬇️ Download",
+                            data=lambda entry=entry: library.read(entry),
+                            file_name=f"design_{entry['id']}.{entry['format'].lower()}",
+                            mime=entry['mime'],
+                            key=f"download_saved_{entry['id']}",
+                            on_click="ignore",
+                            use_container_width=True
+                        )
+                    with col_i2:
+                        st.button("🗑️", key=f"delete_saved_{entry['id']}", on_click=delete_saved_design,
+                                  args=(entry['id'],), use_container_width=True)
+                    st.checkbox("Add to bundle", value=entry['id'] in st.session_state.bundle_selection,
+                                key=f"select_saved_{entry['id']}", on_change=toggle_bundle_selection, args=(entry['id'],))
+            
+            if pages > 1:
+                col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+                with col_p1:
+                    st.button("⬅️ Newer", disabled=page == 0, on_click=change_library_page, args=(-1,),
+                              use_container_width=True)
+                with col_p2:
+                    st.markdown(f"<p style='text-align: center'>Page {page + 1} of {pages}</p>", unsafe_allow_html=True)
+                with col_p3:
+                    st.button("Older ➡️", disabled=page >= pages - 1, on_click=change_library_page, args=(1,),
+                              use_container_width=True)
+        elif query:
+            st.info(f"🔍 No saved designs match “{query}”.")
+        else:
+            st.info("📭 No designs yet. Create your first masterpiece!")
+            st.image("https://via.placeholder.com/400x300/667eea/ffffff?text=Start+Creating!", use_container_width=True)
+
+@st.fragment
+def captions_tab():
+    """Caption ideas; asking for and copying them reruns only this tab"""
+    with profiled("captions"):
+        st.subheader("💡 AI Caption & Text Generator")
+        st.write("Let AI help you write catchy captions and text for your designs!")
+        
+        caption_type = st.selectbox("What do you need?", CAPTION_TYPES, key="caption_type")
+        caption_context = st.text_input("Tell us about your event/theme:", key="caption_context",
+                                        placeholder="E.g., Annual tech fest with coding competitions")
+        
+        if st.button("✨ Generate Caption Ideas", use_container_width=True):
+            st.session_state.caption_ideas = caption_ideas(caption_type, caption_context)
+        
+        # Kept in session state so the copy buttons still have them on the next rerun
+        suggestions = st.session_state.get('caption_ideas')
+        if suggestions is not None:
+            st.success("✅ Here are your AI-generated suggestions:")
+            for i, suggestion in enumerate(suggestions or ["No suggestions"], 1):
+                st.info(f"**Option {i}:**\n{suggestion}")
+                if st.button(f"📋 Copy Option {i}", key=f"copy_{i}"):
+                    st.code(suggestion)
 
 # Main content
-tab1, tab2, tab3, tab4 = st.tabs(["🎨 Create", "📋 Templates", "💾 My Designs", "💡 AI Caption Generator"])
+tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS, key="main_tab", on_change="rerun")
 
-with tab1:
+# The Create tab is always built: its widgets hold the prompt and texts
+with tab1, rerun.section("create"):
     col_main, col_tips = st.columns([2, 1])
     
     with col_main:
@@ -135,7 +480,8 @@ with tab1:
             "Image Description",
             placeholder="Example: A vibrant college fest poster with music notes, colorful lights, energetic crowd, modern design...",
             height=120,
-            help="Describe what you want to see in your image"
+            help="Describe what you want to see in your image",
+            key="prompt_text"
         )
         
         # Quick prompt enhancer
@@ -161,6 +507,12 @@ with tab1:
         
         # Generate buttons
         st.markdown("---")
+        num_variations = st.select_slider(
+            "🎲 Variations per click",
+            options=[1, 2, 3, 4],
+            value=1,
+            help="Generate several candidates in parallel and pick your favorite"
+        )
         col_btn1, col_btn2, col_btn3, col_btn4 = st.columns(4)
         
         with col_btn1:
@@ -172,9 +524,10 @@ with tab1:
             if st.button("💡 AI Suggest", use_container_width=True):
                 st.session_state.show_ai_suggest = True
         with col_btn4:
-            if st.session_state.current_image:
-                if st.button("🔄 Remix", use_container_width=True):
-                    st.session_state.remix = True
+            restyle = False
+            if st.session_state.get('design'):
+                restyle = st.button("🔄 Restyle", use_container_width=True,
+                                    help="Apply the current text and effect settings to your last image without regenerating it")
     
     with col_tips:
         st.markdown('<div class="category-card">', unsafe_allow_html=True)
@@ -214,312 +567,518 @@ with tab1:
             st.markdown(f"**{platform}:** {tip}")
         st.markdown('</div>', unsafe_allow_html=True)
 
+# Only the open tab among the others is built; each reruns on its own as a fragment
 with tab2:
-    st.subheader("📋 Ready-to-Use Templates")
-    st.write("Click any template to customize it for your needs!")
-    
-    # Categorized templates
-    template_categories = {
-        "🎉 College Events": {
-            "Cultural Fest": "Vibrant college cultural festival poster with dancing silhouettes, colorful lights, stage performance, energetic crowd, modern design",
-            "Sports Day": "Dynamic sports event poster with athletes running, jumping, playing, stadium background, energetic action shots",
-            "Tech Fest": "Futuristic technology festival poster with circuit boards, robots, AI elements, holographic displays, cyberpunk style",
-            "Fresher's Party": "Fun and colorful fresher's welcome party poster with confetti, balloons, excited students, celebration theme",
-        },
-        "📚 Academic": {
-            "Workshop": "Professional workshop poster with learning elements, books, laptop, presentation screen, clean modern design",
-            "Seminar": "Elegant seminar poster with microphone, audience, professional setting, academic theme",
-            "Guest Lecture": "Sophisticated guest lecture poster with auditorium, speaker podium, formal academic atmosphere",
-            "Exam Motivation": "Motivational study poster with books, coffee, determined student, inspirational quotes background",
-        },
-        "🎭 Club Activities": {
-            "Music Club": "Musical performance poster with instruments, musical notes, stage lights, energetic concert vibe",
-            "Drama Club": "Theatrical performance poster with stage curtains, masks, spotlight, dramatic atmosphere",
-            "Photography Club": "Creative photography club poster with camera, lenses, beautiful landscapes, artistic composition",
-            "Coding Club": "Tech coding club poster with computer code, algorithms, matrix style, hacker aesthetic",
-        },
-        "😂 Fun Memes": {
-            "Study Life": "Relatable student studying late night with coffee, tired expression, messy desk, funny situation",
-            "Exam Stress": "Stressed student before exams, panic mode, surrounded by books, comedic expression",
-            "Campus Life": "Funny college daily life situation, students hanging out, casual campus setting",
-            "Assignment Deadline": "Student rushing to complete assignment, laptop, panic, funny deadline situation",
-        },
-        "📢 Announcements": {
-            "Registration Open": "Clean registration announcement poster with form icons, checkmarks, modern professional design",
-            "Competition": "Exciting competition announcement with trophy, podium, competitive elements, bold design",
-            "Deadline Notice": "Important deadline notice poster with clock, calendar, urgent warning style, clear information",
-            "Results Out": "Results announcement poster with grades, achievement symbols, celebration or suspense theme",
-        }
-    }
-    
-    for category, templates in template_categories.items():
-        with st.expander(category, expanded=True):
-            cols = st.columns(2)
-            for idx, (name, template_prompt) in enumerate(templates.items()):
-                with cols[idx % 2]:
-                    if st.button(f"📌 {name}", key=f"template_{category}_{name}", use_container_width=True):
-                        st.session_state.selected_template = template_prompt
-                        st.session_state.template_name = name
-                        st.rerun()
+    if tab2.open:
+        templates_tab(size_preset, art_style)
 
 with tab3:
-    st.subheader("💾 My Saved Designs")
-    
-    if st.session_state.history:
-        st.write(f"**Total creations: {len(st.session_state.history)}**")
-        
-        # Filter options
-        col_f1, col_f2 = st.columns([3, 1])
-        with col_f2:
-            if st.button("🗑️ Clear All", use_container_width=True):
-                st.session_state.history = []
-                st.rerun()
-        
-        # Display history
-        cols = st.columns(3)
-        for idx, item in enumerate(reversed(st.session_state.history)):
-            with cols[idx % 3]:
-                st.image(item['image'], use_container_width=True)
-                st.caption(f"🕐 {time.strftime('%I:%M %p', time.localtime(item['timestamp']))}")
-                
-                # Download button for each
-                buf = BytesIO()
-                item['image'].save(buf, format="PNG")
-                st.download_button(
-                    "⬇️ Download",
-                    data=buf.getvalue(),
-                    file_name=f"design_{idx}.png",
-                    mime="image/png",
-                    key=f"download_hist_{idx}",
-                    use_container_width=True
-                )
-    else:
-        st.info("📭 No designs yet. Create your first masterpiece!")
-        st.image("https://via.placeholder.com/400x300/667eea/ffffff?text=Start+Creating!", use_container_width=True)
+    if tab3.open:
+        library_tab()
 
 with tab4:
-    st.subheader("💡 AI Caption & Text Generator")
-    st.write("Let AI help you write catchy captions and text for your designs!")
+    if tab4.open:
+        captions_tab()
+
+# Handle template selection
+if hasattr(st.session_state, 'template_name'):
+    st.toast(f"✅ Loaded template: {st.session_state.template_name}")
+    del st.session_state.template_name
+
+# Image generation function
+def generate_image(prompt, width=512, height=512, style="", seed=None, on_wait=None, local=False,
+                   budget=GEN_LATENCY_BUDGET):
+    """Generate a base image, serving a local background if the backend is too slow
+
+    Returns (image, fallback_reason); the reason is None unless the local
+    background stood in for the configured backend. budget=0 always waits
+    for the backend.
+    """
+    if local:
+        return get_local_backend().generate(prompt, width, height, style, seed), None
+    gave_up = threading.Event()
     
-    caption_type = st.selectbox(
-        "What do you need?",
-        ["Event Headline", "Catchy Tagline", "Call to Action", "Funny Meme Text", "Motivational Quote", "Event Details"]
-    )
+    def queue_update(position, eta):
+        if on_wait is not None and not gave_up.is_set():
+            on_wait(position, eta)
     
-    caption_context = st.text_input("Tell us about your event/theme:", placeholder="E.g., Annual tech fest with coding competitions")
+    # Once the hedge gives up, a request still waiting for its turn leaves the queue
+    client = ScheduledClient(get_http_client(), get_generation_scheduler(), session_id, queue_update,
+                             cancel=gave_up)
+    backend = make_backend(GEN_BACKEND, client)
+    cache, flights = get_image_cache(), get_image_flights()
     
-    if st.button("✨ Generate Caption Ideas", use_container_width=True):
-        with st.spinner("Thinking..."):
-            # Pre-generated suggestions based on type
-            suggestions = {
-                "Event Headline": [
-                    f"🎯 {caption_context.upper() if caption_context else 'YOUR EVENT'} - DON'T MISS OUT!",
-                    f"🔥 THE BIGGEST {caption_context.upper() if caption_context else 'EVENT'} OF THE YEAR",
-                    f"⚡ {caption_context.upper() if caption_context else 'JOIN US'} - LIMITED SPOTS!",
-                ],
-                "Catchy Tagline": [
-                    "Where Innovation Meets Celebration! 🚀",
-                    "Making Memories, Building Futures! ✨",
-                    "Your Journey Begins Here! 🎓",
-                ],
-                "Call to Action": [
-                    "REGISTER NOW - Spots Filling Fast! 📝",
-                    "Join Us & Be Part of Something Amazing! 🌟",
-                    "Don't Wait - Secure Your Spot Today! ⚡",
-                ],
-                "Funny Meme Text": [
-                    "WHEN THE DEADLINE IS TONIGHT\nBUT NETFLIX IS LIFE 😅",
-                    "ME: I'LL START STUDYING\nALSO ME: *SCROLLS FOR 3 HOURS* 📱",
-                    "ASSIGNMENT DUE TOMORROW\nME: TIME TO PANIC! 😱",
-                ],
-                "Motivational Quote": [
-                    "Dream Big. Work Hard. Stay Focused. 💪",
-                    "Success Begins Where Comfort Zone Ends! 🎯",
-                    "Your Only Limit Is You! 🚀",
-                ],
-                "Event Details": [
-                    f"📅 Date: [Your Date]\n📍 Venue: [Your Venue]\n⏰ Time: [Your Time]\n📞 Contact: [Your Number]",
-                    f"🎯 What: {caption_context if caption_context else '[Event Name]'}\n🕐 When: [Date & Time]\n📍 Where: [Location]\n💰 Entry: [Free/Paid]",
-                ]
-            }
-            
-            st.success("✅ Here are your AI-generated suggestions:")
-            for i, suggestion in enumerate(suggestions.get(caption_type, ["No suggestions"]), 1):
-                st.info(f"**Option {i}:**\n{suggestion}")
-                if st.button(f"📋 Copy Option {i}", key=f"copy_{i}"):
-                    st.code(suggestion)
+    def primary():
+        return render.fetch_base_image(prompt, width, height, style, seed, cache=cache, flights=flights, backend=backend)
+    
+    if budget <= 0 or not backend.cacheable:
+        return primary(), None
+    # A late answer still lands in the image cache, so trying again picks it up
+    image, reason = hedge(primary, lambda: get_local_backend().generate(prompt, width, height, style, seed),
+                          budget, on_thread=add_script_run_ctx if on_wait is not None else None)
+    gave_up.set()
+    return image, reason
 
-# Handle template selection
-if hasattr(st.session_state, 'selected_template'):
-    prompt = st.session_state.selected_template
-    if hasattr(st.session_state, 'template_name'):
-        st.toast(f"✅ Loaded template: {st.session_state.template_name}")
-    del st.session_state.selected_template
-    if hasattr(st.session_state, 'template_name'):
-        del st.session_state.template_name
+# What went wrong, in words, for the failures generate_image falls back on
+FALLBACK_REASONS = {
+    "ImageFetchError": "it's overloaded or can't be reached",
+    "UnidentifiedImageError": "it sent back an unreadable image",
+}
 
-# Image generation function
-def generate_image_pollinations(prompt, width=512, height=512, style=""):
-    """Generate image using Pollinations.ai"""
-    style_map = {
-        "Modern Minimal": "minimalist modern design clean aesthetic",
-        "Bold & Colorful": "vibrant bold colors energetic eye-catching",
-        "Professional": "professional clean corporate elegant",
-        "Vintage Retro": "vintage retro nostalgic 80s style",
-        "Cyberpunk": "cyberpunk neon futuristic sci-fi",
-        "Anime": "anime manga japanese animation style",
-        "Cartoon": "cartoon illustrated playful fun",
-        "3D Render": "3d rendered glossy modern cgi",
-        "Realistic Photo": "photorealistic detailed professional photography"
+def show_fallback_notice(reason):
+    """Explain why the design got a local background instead of an AI image"""
+    if reason == "timeout":
+        st.info(f"⏱️ The AI image service didn't answer within {GEN_LATENCY_BUDGET:.0f}s, so this design uses "
+                f"a {art_style} background instead. Generate again in a minute to get the AI image.")
+    else:
+        problem = FALLBACK_REASONS.get(reason, "it ran into an error")
+        st.info(f"⚠️ The AI image service isn't available right now ({problem}), so this design uses "
+                f"a {art_style} background instead.")
+
+def show_queue_position(placeholder):
+    """on_wait callback that shows this session's place in the generation queue"""
+    def on_wait(position, eta):
+        placeholder.info(f"🚦 Lots of people are creating right now - you're #{position} in line (about {eta:.0f}s)")
+    return on_wait
+
+def design_settings():
+    """Current sidebar effects (or None) and text settings"""
+    effects = None
+    if apply_effects:
+        effects = {
+            'brightness': brightness,
+            'contrast': contrast,
+            'saturation': saturation,
+            'hue': hue_shift,
+            'gamma': gamma,
+            'vignette': vignette,
+        }
+    text = {
+        'main_text': main_text,
+        'subtext': subtext,
+        'bottom_text': bottom_text,
+        'contact_info': contact_info,
+        'text_position': text_position,
+        'text_size': text_size,
+        'text_color': text_color,
+        'outline_color': outline_color,
+        'outline_width': outline_width,
+        'text_shadow': text_shadow,
     }
+    return effects, text
+
+def library_metadata(prompt):
+    """Searchable details stored with a design in the library"""
+    name, template_prompt = st.session_state.get('active_template', (None, None))
+    return {
+        'prompt': prompt,
+        'style': art_style,
+        'preset': size_preset,
+        'template': name if prompt == template_prompt else None,
+        # Contact details are left out of the index; they are only in the image pixels
+        'texts': {'main_text': main_text, 'subtext': subtext, 'bottom_text': bottom_text},
+    }
+
+def save_design(image, prompt):
+    """Save a finished design to the library off-thread, returning a Future of its design id
+
+    The full-size PNG and thumbnail take the better part of a second at
+    print sizes, so the script only encodes the on-page copy. The PNG is
+    written straight into the library, and downloads read it back, so no
+    session holds the encoded bytes.
+    """
+    library, owner, metadata = get_design_library(), library_owner, library_metadata(prompt)
+    return get_render_executor().submit(library.save_image, owner, image, **metadata)
+
+def compose_design(image, scale=1.0):
+    """Apply effects and text to a base image (scale < 1 for previews)"""
+    effects, text = design_settings()
+    return render.compose_design(image, effects=effects, scale=scale, **text)
+
+def finish_design(image, prompt, source=None):
+    """Apply effects and text to a base image, save it and show downloads
+
+    source is the (prompt, width, height, style, seed, local) request the
+    base came from, so Restyle can rebuild it once its layers are evicted
+    (None if it cannot be rebuilt, e.g. an upscaled preview).
+    """
+    # Keep the layers so later text/effect edits can skip regeneration
+    layers = render.DesignLayers(image, memory_bounded=is_large_format(*image.size))
+    st.session_state.design = {'prompt': prompt, 'source': source}
+    effects, text = design_settings()
+    image = layers.compose(effects, **text)
+    get_session_memory().put(session_id, 'layers', layers, layers.nbytes)
+    saved = save_design(image, prompt)
     
-    full_prompt = f"{prompt}, {style_map.get(style, '')}"
-    encoded_prompt = urllib.parse.quote(full_prompt)
-    api_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?width={width}&height={height}&nologo=true&enhance=true"
+    st.balloons()
+    st.success("✅ Your design is ready!")
+    set_result(image, saved)
+
+def reload_base(source):
+    """Rebuild a design's base image without asking the image service, or None if it can't be"""
+    if source is None:
+        return None
+    prompt, width, height, style, seed, local = source
+    backend = get_local_backend() if local else make_backend(GEN_BACKEND)
+    if not backend.cacheable:
+        return backend.generate(prompt, width, height, style, seed)
+    cache, key = get_image_cache(), render.request_key(prompt, width, height, style, seed)
+    data = cache.get(key)
+    return None if data is None else render.decode_base_image(data, cache, key)
+
+def restyle_design():
+    """Recompose the last design's cached layers with the current settings
+
+    Returns False when the layers were evicted and the base can no longer
+    be rebuilt, so there is nothing to restyle.
+    """
+    design = st.session_state.design
+    memory = get_session_memory()
+    layers = memory.get(session_id, 'layers')
+    if layers is None:
+        base = reload_base(design['source'])
+        if base is None:
+            st.session_state.design = None
+            return False
+        layers = render.DesignLayers(base, memory_bounded=is_large_format(*base.size))
+    effects, text = design_settings()
+    image = layers.compose(effects, **text)
+    memory.put(session_id, 'layers', layers, layers.nbytes)
+    saved = save_design(image, design['prompt'])
     
-    response = requests.get(api_url, timeout=30)
-    if response.status_code == 200:
-        return Image.open(BytesIO(response.content))
-    raise Exception(f"Failed to generate image")
-
-def add_text_to_image(image, texts, position, font_size, text_color, outline_color):
-    """Add multiple text layers to image"""
-    img = image.copy()
-    draw = ImageDraw.Draw(img)
+    st.success("✅ Restyled! Saving a copy to My Designs...")
+    set_result(image, saved)
+    return True
+
+def display_bytes(image, max_side=DISPLAY_MAX_SIDE):
+    """Encode an on-page copy once, downscaled so print sizes don't ship megapixels to the browser
+
+    Reruns then resend the same bytes instead of re-encoding a PIL image.
+    """
+    with span("display"):
+        return encode_variant(image, "JPEG", (max_side, max_side), 90)
+
+def set_result(image, saved):
+    """Make a finished design the one the result panel shows
+
+    Only the on-page copy is kept, within the session's memory budget;
+    downloads decode the library copy once saved (a Future of its design
+    id) is done.
+    """
+    library, owner, display = get_design_library(), library_owner, display_bytes(image)
     
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
-        small_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", int(font_size * 0.6))
-    except:
-        font = ImageFont.load_default()
-        small_font = font
+    def load_image():
+        entries = library.entries(owner, [saved.result()])
+        if not entries:
+            raise FileNotFoundError("This design was deleted from My Designs")
+        return library.load_image(entries[0])
     
-    img_width, img_height = img.size
-    y_positions = {
-        "Top": 40,
-        "Center": img_height // 2 - 50,
-        "Bottom": img_height - 150,
-    }
+    result = {'display': display, 'digest': f"design-{uuid.uuid4().hex}", 'load_image': load_image}
+    get_session_memory().put(session_id, 'result', result, len(display))
+
+def show_downloads(digest, load_image):
+    """Download buttons that encode only when clicked (memoized per digest)"""
+    exports = get_export_cache()
+    col_d1, col_d2, col_d3, col_d4 = st.columns(4)
+    
+    with col_d1:
+        st.download_button("📥 PNG (Best)", lambda: exports.export(digest, load_image, "PNG"),
+                           "design.png", "image/png", on_click="ignore", use_container_width=True)
+    
+    with col_d2:
+        st.download_button("📥 JPG (Print)", lambda: exports.export(digest, load_image, "JPEG", quality=95),
+                           "design.jpg", "image/jpeg", on_click="ignore", use_container_width=True)
+    
+    with col_d3:
+        st.download_button("📥 Web (Small)", lambda: exports.export(digest, load_image, "PNG", (800, 800)),
+                           "design_web.png", "image/png", on_click="ignore", use_container_width=True)
     
-    current_y = y_positions.get(position, 40)
+    with col_d4:
+        st.download_button("📥 WhatsApp", lambda: exports.export(digest, load_image, "PNG", (400, 400)),
+                           "design_wa.png", "image/png", on_click="ignore", use_container_width=True)
     
-    for text_content, use_font in texts:
-        if not text_content:
-            continue
+    st.download_button(f"📦 All sizes & formats ({BUNDLE_FILES} files, ZIP)",
+                       lambda: bundle_bytes([("design", load_image)]),
+                       "design_bundle.zip", "application/zip", on_click="ignore", use_container_width=True)
+
+def generate_variation(enhanced_prompt, width, height, style, seed, local=False):
+    """Fetch and decode one seeded variation, returning (image, fallback_reason) (runs on a worker thread)"""
+    image, reason = generate_image(enhanced_prompt, width, height, style, seed=seed, local=local)
+    image.load()
+    return image, reason
+
+def render_full_resolution(enhanced_prompt, width, height, style, seed, preview, local=False):
+    """Render a previewed design at full size, returning (image, upscaled) (runs on a worker thread)
+
+    The user has already accepted the preview and nobody waits on this,
+    so the backend is not hedged; if it still fails, the preview's base
+    is scaled up rather than replaced by an unrelated local background.
+    A local preview gets the same local background at full size.
+    """
+    if local:
+        return generate_image(enhanced_prompt, width, height, style, seed=seed, local=True)[0], False
+    try:
+        image, _ = generate_image(enhanced_prompt, width, height, style, seed=seed, budget=0)
+        image.load()
+        return image, False
+    except Exception:
+        return preview.resize((width, height), Image.LANCZOS), True
+
+def record_trace(trace, ok):
+    """Finish a render trace and keep it for the debug panel"""
+    # Renders wait on the image service, so their run is not held to the rerun budget
+    profile = current_rerun()
+    if profile is not None:
+        profile.annotate(render=True)
+    trace = end_trace(trace, ok)
+    if trace is not None:
+        st.session_state.last_trace = trace.as_dict()
+        if METRICS_FILE:
+            registry.write_prometheus_file(METRICS_FILE)
+
+def pick_variation(idx):
+    st.session_state.picked_variation = idx
+
+@st.cache_resource
+def get_render_executor():
+    """Process-wide worker pool for background full-resolution renders and library saves"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="full-render")
+
+@st.fragment(run_every=2)
+def full_render_status():
+    """Poll the background render and rerun the app once it is ready"""
+    job = st.session_state.get('full_render')
+    if job is None:
+        return
+    if job['future'].done():
+        st.rerun()
+    st.caption(f"⏳ Rendering full {width}x{height} resolution in the background...")
+
+@st.fragment
+def result_panel():
+    """The latest design and its downloads, the quick preview, and the variation picker
+
+    Picking a variation reruns only this panel, and the design stays on
+    the page across other interactions until a new one replaces it.
+    """
+    with profiled("result"):
+        picked = st.session_state.get('picked_variation')
+        if picked is not None:
+            picked = st.session_state.variations[picked]
+            st.session_state.picked_variation = None
+            with st.spinner("🎨 Finishing your design..."):
+                trace = start_trace(mode="variation_pick", size=f"{width}x{height}", style=art_style)
+                ok = False
+                try:
+                    # Only the thumbnail was kept; the seeded base comes back from the image cache
+                    image, reason = generate_image(picked['enhanced_prompt'], *picked['size'], picked['style'],
+                                                   seed=picked['seed'], local=picked['fallback'] is not None)
+                    if reason is not None:
+                        show_fallback_notice(reason)
+                    finish_design(image, picked['prompt'],
+                                  (picked['enhanced_prompt'], *picked['size'], picked['style'], picked['seed'],
+                                   picked['fallback'] is not None))
+                    ok = True
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+                finally:
+                    record_trace(trace, ok)
         
-        text_upper = text_content.upper()
-        bbox = draw.textbbox((0, 0), text_upper, font=use_font)
-        text_width = bbox[2] - bbox[0]
-        x = (img_width - text_width) // 2
+        # Progressive rendering: show the preview until the full render lands
+        if st.session_state.get('full_render'):
+            if st.session_state.full_render['future'].done():
+                job = st.session_state.full_render
+                st.session_state.full_render = None
+                st.session_state.preview = None
+                with st.spinner("🎨 Finishing the full-resolution design..."):
+                    trace = start_trace(mode="full", size=f"{width}x{height}", style=art_style)
+                    ok = False
+                    try:
+                        image, upscaled = job['future'].result()
+                        if job['fallback'] is not None:
+                            show_fallback_notice(job['fallback'])
+                        elif upscaled:
+                            st.info(f"⚠️ The full {width}x{height} image couldn't be rendered, so this design "
+                                    "is the preview scaled up. Generate again for a sharper print.")
+                        finish_design(image, job['prompt'], None if upscaled else job['source'])
+                        ok = True
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
+                        st.info("💡 Try: Different prompt, smaller size, or wait a moment and retry")
+                    finally:
+                        record_trace(trace, ok)
+            else:
+                st.image(st.session_state.preview, caption="⚡ Quick preview", use_container_width=True)
+                full_render_status()
         
-        # Draw outline
-        for adj in range(-3, 4):
-            for adj_y in range(-3, 4):
-                draw.text((x + adj, current_y + adj_y), text_upper, font=use_font, fill=outline_color)
+        result = get_session_memory().get(session_id, 'result')
+        if result:
+            st.image(result['display'], use_container_width=True)
+            show_downloads(result['digest'], result['load_image'])
         
-        # Draw main text
-        draw.text((x, current_y), text_upper, fill=text_color, font=use_font)
-        current_y += bbox[3] - bbox[1] + 20
-    
-    return img
+        # Variation picker
+        if st.session_state.get('variations'):
+            st.markdown("---")
+            st.subheader("🎲 Pick a Variation")
+            cols = st.columns(len(st.session_state.variations))
+            for idx, variation in enumerate(st.session_state.variations):
+                with cols[idx]:
+                    if variation is None:
+                        st.warning(f"Variation {idx + 1} failed")
+                        continue
+                    local = " · 🎨 local background" if variation.get('fallback') else ""
+                    st.image(variation['display'], caption=f"Variation {idx + 1}{local}", use_container_width=True)
+                    st.button("✅ Use This", key=f"pick_variation_{idx}", on_click=pick_variation, args=(idx,), use_container_width=True)
 
 # Main generation
 if generate and prompt:
-    with st.spinner("🎨 Creating your design... This may take 10-20 seconds"):
-        try:
-            # Enhance prompt based on options
-            enhanced_prompt = prompt
-            if add_energy:
-                enhanced_prompt += ", high energy vibrant dynamic"
-            if add_professional:
-                enhanced_prompt += ", professional clean elegant"
-            if add_fun:
-                enhanced_prompt += ", fun playful cheerful"
-            
-            # Generate
-            image = generate_image_pollinations(enhanced_prompt, width, height, art_style)
-            
-            # Apply effects
-            if apply_effects:
-                if brightness != 1.0:
-                    enhancer = ImageEnhance.Brightness(image)
-                    image = enhancer.enhance(brightness)
-                if contrast != 1.0:
-                    enhancer = ImageEnhance.Contrast(image)
-                    image = enhancer.enhance(contrast)
-                if saturation != 1.0:
-                    enhancer = ImageEnhance.Color(image)
-                    image = enhancer.enhance(saturation)
-            
-            # Add text
+    # Enhance prompt based on options
+    enhanced_prompt = enhance_prompt(prompt, add_energy, add_professional, add_fun)
+    st.session_state.variations = None
+    st.session_state.full_render = None
+    get_session_memory().discard(session_id, 'result')
+    
+    if num_variations > 1:
+        st.info(f"🎲 Generating {num_variations} variations in parallel...")
+        variation_slots = [col.empty() for col in st.columns(num_variations)]
+        variations = [None] * num_variations
+        seeds = random_seeds(num_variations)
+        trace = start_trace(mode="variations", size=f"{width}x{height}", style=art_style, count=num_variations)
+        results = generate_variations(
+            lambda seed: generate_variation(enhanced_prompt, width, height, art_style, seed),
+            seeds,
+        )
+        for idx, seed, result, error in results:
+            if error is not None:
+                variation_slots[idx].error(f"❌ Variation {idx + 1} failed: {error}")
+                continue
+            image, reason = result
+            variations[idx] = {'display': display_bytes(image, VARIATION_MAX_SIDE), 'seed': seed, 'prompt': prompt,
+                               'enhanced_prompt': enhanced_prompt, 'size': (width, height), 'style': art_style,
+                               'fallback': reason}
+            variation_slots[idx].image(variations[idx]['display'], caption=f"Variation {idx + 1}", use_container_width=True)
+        st.session_state.variations = variations
+        record_trace(trace, any(variations))
+        st.rerun()
+    elif progressive_preview and is_print_size(width, height):
+        seed = random_seeds(1)[0]
+        preview_width, preview_height = preview_size(width, height)
+        with st.spinner("⚡ Creating a quick preview..."):
+            trace = start_trace(mode="preview", size=f"{preview_width}x{preview_height}", style=art_style)
+            ok = False
+            queue_slot = st.empty()
             try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", text_size)
-                small_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", int(text_size * 0.6))
-            except:
-                font = ImageFont.load_default()
-                small_font = font
-            
-            if text_position != "None":
-                texts_to_add = []
-                if text_position in ["Top", "Top & Bottom"] and main_text:
-                    texts_to_add.append((main_text, font))
-                if subtext:
-                    texts_to_add.append((subtext, small_font))
-                if text_position in ["Bottom", "Top & Bottom"] and bottom_text:
-                    texts_to_add.append((bottom_text, small_font))
-                if contact_info:
-                    texts_to_add.append((contact_info, small_font))
-                
-                if texts_to_add:
-                    image = add_text_to_image(image, texts_to_add, text_position, text_size, text_color, outline_color)
-            
-            # Save to session
-            st.session_state.current_image = image
-            st.session_state.history.append({
-                'image': image,
-                'prompt': prompt,
-                'timestamp': time.time()
-            })
-            
-            # Display
-            st.balloons()
-            st.success("✅ Your design is ready!")
-            st.image(image, use_container_width=True)
-            
-            # Download options
-            col_d1, col_d2, col_d3, col_d4 = st.columns(4)
-            
-            with col_d1:
-                buf = BytesIO()
-                image.save(buf, format="PNG")
-                st.download_button("📥 PNG (Best)", buf.getvalue(), "design.png", "image/png", use_container_width=True)
-            
-            with col_d2:
-                buf = BytesIO()
-                image.convert('RGB').save(buf, format="JPEG", quality=95)
-                st.download_button("📥 JPG (Print)", buf.getvalue(), "design.jpg", "image/jpeg", use_container_width=True)
-            
-            with col_d3:
-                thumb = image.copy()
-                thumb.thumbnail((800, 800))
-                buf = BytesIO()
-                thumb.save(buf, format="PNG")
-                st.download_button("📥 Web (Small)", buf.getvalue(), "design_web.png", "image/png", use_container_width=True)
-            
-            with col_d4:
-                thumb = image.copy()
-                thumb.thumbnail((400, 400))
-                buf = BytesIO()
-                thumb.save(buf, format="PNG")
-                st.download_button("📥 WhatsApp", buf.getvalue(), "design_wa.png", "image/png", use_container_width=True)
-            
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
-            st.info("💡 Try: Different prompt, smaller size, or wait a moment and retry")
+                preview, reason = generate_image(enhanced_prompt, preview_width, preview_height, art_style,
+                                                 seed=seed, on_wait=show_queue_position(queue_slot))
+                st.session_state.preview = display_bytes(compose_design(preview, scale=preview_width / width))
+                st.session_state.full_render = {
+                    'future': get_render_executor().submit(
+                        render_full_resolution, enhanced_prompt, width, height, art_style, seed, preview,
+                        reason is not None
+                    ),
+                    'prompt': prompt,
+                    'fallback': reason,
+                    'source': (enhanced_prompt, width, height, art_style, seed, reason is not None),
+                }
+                ok = True
+            except SchedulerBusy as e:
+                st.warning(f"🚦 {e}")
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
+                st.info("💡 Try: Different prompt, smaller size, or wait a moment and retry")
+            finally:
+                queue_slot.empty()
+                record_trace(trace, ok)
+    else:
+        with st.spinner("🎨 Creating your design... This may take 10-20 seconds"):
+            trace = start_trace(mode="single", size=f"{width}x{height}", style=art_style)
+            ok = False
+            queue_slot = st.empty()
+            try:
+                # Generate
+                image, reason = generate_image(enhanced_prompt, width, height, art_style,
+                                               on_wait=show_queue_position(queue_slot))
+                queue_slot.empty()
+                if reason is not None:
+                    show_fallback_notice(reason)
+                finish_design(image, prompt, (enhanced_prompt, width, height, art_style, None, reason is not None))
+                ok = True
+            except SchedulerBusy as e:
+                st.warning(f"🚦 {e}")
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
+                st.info("💡 Try: Different prompt, smaller size, or wait a moment and retry")
+            finally:
+                queue_slot.empty()
+                record_trace(trace, ok)
 
 elif generate:
     st.warning("⚠️ Please describe what you want to create!")
 
+elif restyle:
+    with st.spinner("🎨 Restyling your design..."):
+        trace = start_trace(mode="restyle", size=f"{width}x{height}", style=art_style)
+        ok = False
+        try:
+            ok = restyle_design()
+            if not ok:
+                st.warning("⚠️ This design's image was cleared from memory to make room for others. "
+                           "Generate it again to keep restyling.")
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+        finally:
+            record_trace(trace, ok)
+
+result_panel()
+
+# Everything above counts towards this run's time; the debug panel reports it
+finish_rerun(rerun)
+
+# Debug panel
+if show_debug:
+    with st.sidebar:
+        st.markdown("#### ⏱️ Last Render")
+        last_trace = st.session_state.get('last_trace')
+        if last_trace:
+            st.caption(f"{last_trace['mode']} · {last_trace['size']} · {last_trace['total_ms']:.0f} ms total")
+            st.table({
+                'Stage': [stage['stage'] for stage in last_trace['stages']],
+                'ms': [stage['ms'] for stage in last_trace['stages']],
+            })
+        else:
+            st.caption("Generate a design to see where the time goes.")
+        
+        st.markdown("#### 🔁 Reruns")
+        reruns = list(reversed(st.session_state.reruns))
+        budget_note = f" of a {RERUN_BUDGET_MS} ms budget" if RERUN_BUDGET_MS > 0 else ""
+        st.caption(f"This run took {reruns[0]['total_ms']:.0f} ms{budget_note}")
+        st.table({
+            'Section': [section['section'] for section in reruns[0]['sections']],
+            'ms': [section['ms'] for section in reruns[0]['sections']],
+        })
+        st.caption("Recent runs, newest first (⚠️ over budget, 🎨 rendered a design)")
+        st.table({
+            'Run': [run['scope'] for run in reruns],
+            'ms': [run['total_ms'] for run in reruns],
+            '': ["⚠️" if run['over_budget'] else "🎨" if run['kind'] == "render" else "" for run in reruns],
+        })
+        
+        st.markdown("#### 📈 Process Metrics")
+        queue = get_generation_scheduler().stats()
+        st.caption(f"🚦 {queue['running']} generating, {queue['queued']} queued, {queue['shed']} shed "
+                   f"(~{queue['avg_seconds']:.1f}s per image)")
+        memory = get_session_memory().stats()
+        st.caption(f"🧠 This session keeps {get_session_memory().usage(session_id) / 1024**2:.1f} of "
+                   f"{SESSION_MEMORY_MB} MB for its design · all sessions ({memory['sessions']}): "
+                   f"{memory['bytes'] / 1024**2:.0f} of {SESSION_MEMORY_GLOBAL_MB} MB, {memory['evicted']} evictions")
+        flights = get_image_flights().stats()
+        st.caption(f"🔗 {flights['saved']} upstream calls saved by coalescing "
+                   f"({flights['calls']} made, {flights['in_flight']} in flight)")
+        snapshot = registry.snapshot()
+        st.json(snapshot, expanded=False)
+        st.download_button("⬇️ Prometheus metrics", registry.prometheus_text(), "metrics.prom", "text/plain",
+                           on_click="ignore", use_container_width=True)
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,68 @@
+"""Benchmark: chained ImageEnhance passes vs the fused utils.color pipeline
+
+Run from the repository root:
+    python -m benchmarks.bench_color [--repeat N]
+
+Also checks that the fused output stays within a couple of levels of the
+original Brightness -> Contrast -> Color chain.
+"""
+import argparse
+import time
+
+from PIL import ImageChops, ImageEnhance, ImageStat
+
+from benchmarks.stub_server import make_test_image
+from utils.color import ColorPipeline
+from utils.presets import SIZE_PRESETS
+
+SETTINGS = [
+    (0.8, 1.2, 1.3),
+    (1.3, 0.8, 0.7),
+    (1.0, 1.4, 1.0),
+]
+
+
+def legacy_effects(image, brightness, contrast, saturation):
+    """The original ImageEnhance chain from the generation block"""
+    if brightness != 1.0:
+        image = ImageEnhance.Brightness(image).enhance(brightness)
+    if contrast != 1.0:
+        image = ImageEnhance.Contrast(image).enhance(contrast)
+    if saturation != 1.0:
+        image = ImageEnhance.Color(image).enhance(saturation)
+    return image
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'preset':<22}{'settings':>16}{'legacy ms':>11}{'fused ms':>10}{'speedup':>9}{'max diff':>10}{'mean diff':>11}")
+    worst = 0
+    for name, (width, height) in SIZE_PRESETS.items():
+        base = make_test_image(width, height)
+        for settings in SETTINGS:
+            pipeline = ColorPipeline(*settings)
+            legacy = best_of(lambda: legacy_effects(base, *settings), args.repeat)
+            fused = best_of(lambda: pipeline.apply(base), args.repeat)
+            diff = ImageChops.difference(legacy_effects(base, *settings), pipeline.apply(base))
+            max_diff = max(high for _, high in diff.getextrema())
+            mean_diff = sum(ImageStat.Stat(diff).mean) / 3
+            worst = max(worst, max_diff)
+            print(f"{name:<22}{str(settings):>16}{legacy * 1000:>11.1f}{fused * 1000:>10.1f}"
+                  f"{legacy / fused:>8.1f}x{max_diff:>10}{mean_diff:>11.3f}")
+    print(f"worst per-channel difference: {worst} levels")
+
+
+if __name__ == "__main__":
+    main()
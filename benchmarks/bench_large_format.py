@@ -0,0 +1,150 @@
+"""Peak memory of finishing a large-format design the way the app does
+
+Run from the repository root:
+    python -m benchmarks.bench_large_format [--preset "A3 Poster"] [--ceiling 1.5]
+
+With the decoded base already held (as the app's design layers hold it),
+one poster is composed through memory-bounded DesignLayers, encoded for the
+page and saved to a design library, each path in a fresh process. It then
+reports how far the process's peak RSS rose above its footprint before
+composing. "streamed" is the app's path: the PNG is encoded straight into
+the library's blob store. "bytesio" encodes it in memory first, for
+comparison. Exits with status 1 when the streamed path needs more than
+`ceiling` times the size of one decoded image; tests/test_large_format.py
+runs the same check under pytest.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from benchmarks.stub_server import make_test_image
+from utils.presets import SIZE_PRESETS
+
+MB = 1024 * 1024
+PATHS = ("bytesio", "streamed")
+# The app's on-page copy (DISPLAY_MAX_SIDE)
+DISPLAY_MAX_SIDE = 1600
+TEXT = {
+    "main_text": "College Fest 2024",
+    "subtext": "Join us for the biggest celebration!",
+    "bottom_text": "Date: Dec 25 | Venue: Campus Ground",
+    "contact_info": "Contact: +91 98765 43210",
+    "text_position": "Top & Bottom",
+    "text_shadow": True,
+}
+EFFECTS = {"brightness": 1.1, "contrast": 1.2, "saturation": 1.3, "hue": 10.0, "vignette": 0.4}
+
+
+def _rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss():
+    """Peak RSS since the last _reset_peak() (Linux VmHWM)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def _reset_peak():
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def peak_rss_supported():
+    """Whether this system exposes the /proc files the measurement needs"""
+    return os.access("/proc/self/clear_refs", os.W_OK) and os.path.exists("/proc/self/status")
+
+
+def _render(path, data):
+    """Finish one poster in this (fresh) process and return (peak growth in MB, seconds)"""
+    from utils.export import encode_variant
+    from utils.history import encode_design
+    from utils.library import DesignLibrary
+    from utils.render import DesignLayers
+
+    with tempfile.TemporaryDirectory() as library_dir:
+        library = DesignLibrary(library_dir)
+        base = Image.open(BytesIO(data))
+        base.load()
+        layers = DesignLayers(base, memory_bounded=True)
+        baseline = _rss()
+        _reset_peak()
+        start = time.perf_counter()
+        image = layers.compose(EFFECTS, **TEXT)
+        display = encode_variant(image, "JPEG", (DISPLAY_MAX_SIDE, DISPLAY_MAX_SIDE), 90)
+        if path == "streamed":
+            library.save_image("bench", image, prompt="A3 poster")
+        else:
+            encoded = encode_design(image)
+            library.save("bench", encoded["data"], encoded["thumbnail"], encoded["digest"],
+                         size=encoded["size"], prompt="A3 poster")
+            del encoded
+        del image, display
+        elapsed = time.perf_counter() - start
+        growth = _peak_rss() - baseline
+        library.close()
+    return growth / MB, elapsed
+
+
+def measure(path, data):
+    """Run _render for one path in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(_render, path, data).result()
+
+
+def poster_bytes(preset):
+    """(JPEG bytes, decoded size in MB) of a preset-sized test base
+
+    Fine grain over the smooth stand-in makes the PNG about as large as a
+    generated photo's (around 33 MB at A3), so the in-memory path pays
+    its real cost.
+    """
+    width, height = SIZE_PRESETS[preset]
+    image = Image.blend(make_test_image(width, height, seed=7),
+                        Image.effect_noise((width, height), 64).convert("RGB"), 0.15)
+    buf = BytesIO()
+    image.save(buf, format="JPEG", quality=90)
+    # Pillow stores RGB as 4 bytes per pixel
+    return buf.getvalue(), width * height * 4 / MB
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak memory of the large-format design path")
+    parser.add_argument("--preset", default="A3 Poster", choices=[p for p in SIZE_PRESETS if p != "Custom"])
+    parser.add_argument("--ceiling", type=float, default=1.5,
+                        help="allowed peak growth, in decoded-image sizes (default 1.5)")
+    args = parser.parse_args(argv)
+
+    data, image_mb = poster_bytes(args.preset)
+    ceiling_mb = args.ceiling * image_mb
+    width, height = SIZE_PRESETS[args.preset]
+    print(f"{args.preset} ({width}x{height}), one decoded image = {image_mb:.1f} MB")
+    print(f"  {'path':<10}{'peak growth MB':>16}{'x image':>10}{'seconds':>10}")
+    results = {}
+    for path in PATHS:
+        growth, elapsed = measure(path, data)
+        results[path] = growth
+        print(f"  {path:<10}{growth:>16.1f}{growth / image_mb:>10.2f}{elapsed:>10.2f}")
+
+    if results["streamed"] > ceiling_mb:
+        print(f"\n❌ Streamed path peaked {results['streamed']:.1f} MB above baseline "
+              f"(ceiling {ceiling_mb:.1f} MB)")
+        return 1
+    print(f"\n✅ Streamed path stays under the {ceiling_mb:.1f} MB ceiling")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Rerun latency check: script time per interaction in the Streamlit app
+
+Run from the repository root:
+    python -m benchmarks.bench_rerun [--repeat 5] [--budget-ms 300]
+
+Drives app.py headlessly with Streamlit's AppTest, on the procedural
+backend so nothing touches the network, through the interactions people
+repeat all the time: loading the page, nudging a sidebar slider with a
+finished design on screen, opening each tab, paging and searching a
+library of saved designs, and asking for caption ideas. Each
+interaction's time comes from the app's own rerun profiler. Reports the
+median and worst run per interaction with its slowest section, and exits
+with status 1 when a median is over budget, so the check can gate CI.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+TABS = {"create": "🎨 Create", "templates": "📋 Templates", "library": "💾 My Designs",
+        "captions": "💡 AI Caption Generator"}
+SAVED_DESIGNS = 12
+
+
+def _run(at, tab="create"):
+    """Rerun the app on a tab and return the profile of that run
+
+    AppTest does not send the tabs widget's state back the way a browser
+    does, so the open tab is set before every run.
+    """
+    at.session_state["main_tab"] = TABS[tab]
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at.session_state["reruns"][-1]
+
+
+def _button(at, text):
+    return next(b for b in at.button if text in b.label)
+
+
+def _session():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    _run(at)
+    return at
+
+
+def _prepare(at):
+    """Finish one design (a render, so not measured) and fill the library"""
+    from benchmarks.stub_server import make_test_image
+    from utils.library import DesignLibrary
+
+    at.text_area(key="prompt_text").set_value("A vibrant college fest poster")
+    at.text_input[0].set_value("COLLEGE FEST 2024")
+    _button(at, "Generate Design").click()
+    _run(at)
+    library = DesignLibrary(os.environ["MEME_LIBRARY_DIR"])
+    for i in range(SAVED_DESIGNS):
+        library.save_image(at.session_state["library_owner"], make_test_image(1080, 1080, seed=i),
+                           prompt=f"Hackathon poster {i}", style="Cyberpunk")
+    library.close()
+
+
+def interactions(at, step):
+    """Yield (name, profile) for one pass over the common interactions"""
+    yield "load", _run(_session())
+    text_size = next(s for s in at.slider if s.label == "Text Size")
+    text_size.set_value(40 + step % 2)
+    yield "sidebar slider", _run(at)
+    yield "open templates", _run(at, "templates")
+    yield "open my designs", _run(at, "library")
+    _button(at, "Older").click()
+    yield "library next page", _run(at, "library")
+    at.text_input(key="library_query").set_value("hackathon" if step % 2 else "poster")
+    yield "library search", _run(at, "library")
+    yield "open captions", _run(at, "captions")
+    _button(at, "Generate Caption Ideas").click()
+    yield "caption ideas", _run(at, "captions")
+    yield "back to create", _run(at)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Script time per interaction in the Streamlit app")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the interactions (default 5)")
+    parser.add_argument("--budget-ms", type=int, default=int(os.environ.get("MEME_RERUN_BUDGET_MS", "300")),
+                        help="allowed median script time per interaction (default 300)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        os.environ.update({
+            "MEME_GEN_BACKEND": "procedural",
+            "MEME_IMAGE_CACHE_DIR": os.path.join(root, "images"),
+            "MEME_TEMPLATE_DIR": os.path.join(root, "templates"),
+            "MEME_LIBRARY_DIR": os.path.join(root, "library"),
+            "MEME_RERUN_BUDGET_MS": str(args.budget_ms),
+        })
+        at = _session()
+        _prepare(at)
+        timings = {}
+        for step in range(args.repeat):
+            for name, profile in interactions(at, step):
+                timings.setdefault(name, []).append(profile)
+
+    print(f"{args.repeat} passes, budget {args.budget_ms} ms per interaction")
+    print(f"  {'interaction':<20}{'median ms':>11}{'worst ms':>10}  slowest section")
+    over = []
+    for name, profiles in timings.items():
+        totals = [profile["total_ms"] for profile in profiles]
+        median = statistics.median(totals)
+        worst = max(profiles, key=lambda profile: profile["total_ms"])
+        slowest = max(worst["sections"], key=lambda section: section["ms"], default=None)
+        section = f"{slowest['section']} ({slowest['ms']:.0f} ms)" if slowest else "-"
+        print(f"  {name:<20}{median:>11.1f}{worst['total_ms']:>10.1f}  {section}")
+        if median > args.budget_ms:
+            over.append(name)
+
+    if over:
+        print(f"\n❌ Over the {args.budget_ms} ms rerun budget: {', '.join(over)}")
+        return 1
+    print(f"\n✅ Every interaction reruns within {args.budget_ms} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Micro-benchmark: legacy 7x7 draw.text outline loop vs utils.text_render
+
+Run from the repository root:
+    python -m benchmarks.bench_text_render [--repeat N]
+"""
+import argparse
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.presets import SIZE_PRESETS
+from utils.text_render import render_text
+
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+SMALL_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+def legacy_add_text(image, texts, position, text_color, outline_color):
+    """The original add_text_to_image outline loop, kept for comparison"""
+    img = image.copy()
+    draw = ImageDraw.Draw(img)
+    img_width, img_height = img.size
+    y_positions = {"Top": 40, "Center": img_height // 2 - 50, "Bottom": img_height - 150}
+    current_y = y_positions.get(position, 40)
+    for text_content, use_font in texts:
+        if not text_content:
+            continue
+        text_upper = text_content.upper()
+        bbox = draw.textbbox((0, 0), text_upper, font=use_font)
+        x = (img_width - (bbox[2] - bbox[0])) // 2
+        for adj in range(-3, 4):
+            for adj_y in range(-3, 4):
+                draw.text((x + adj, current_y + adj_y), text_upper, font=use_font, fill=outline_color)
+        draw.text((x, current_y), text_upper, fill=text_color, font=use_font)
+        current_y += bbox[3] - bbox[1] + 20
+    return img
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--text-size", type=int, default=50)
+    args = parser.parse_args()
+
+    font = ImageFont.truetype(FONT_PATH, args.text_size)
+    small_font = ImageFont.truetype(SMALL_FONT_PATH, int(args.text_size * 0.6))
+    texts = [
+        ("College Fest 2024", font),
+        ("Join us for the biggest celebration!", small_font),
+        ("Date: Dec 25 | Venue: Campus Ground", small_font),
+        ("Contact: +91 98765 43210", small_font),
+    ]
+
+    print(f"{'preset':<22}{'size':>12}{'legacy ms':>12}{'new ms':>10}{'new+shadow':>12}{'speedup':>9}")
+    for name, (width, height) in SIZE_PRESETS.items():
+        base = Image.new("RGB", (width, height), (40, 60, 120))
+        legacy = best_of(lambda: legacy_add_text(base, texts, "Top", "#FFFFFF", "#000000"), args.repeat)
+        new = best_of(lambda: render_text(base, texts, "Top", "#FFFFFF", "#000000"), args.repeat)
+        shadow = best_of(lambda: render_text(base, texts, "Top", "#FFFFFF", "#000000", shadow=True), args.repeat)
+        print(f"{name:<22}{f'{width}x{height}':>12}{legacy * 1000:>12.1f}{new * 1000:>10.1f}"
+              f"{shadow * 1000:>12.1f}{legacy / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
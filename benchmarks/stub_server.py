@@ -0,0 +1,111 @@
+"""Local stand-in for the Pollinations image API, for offline benchmarks and tests
+
+Serves deterministic JPEGs for /prompt/<text>?width=W&height=H[&seed=S]
+with configurable latency and failure rate, or scripted error responses.
+"""
+import random
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+
+def make_test_image(width, height, seed=0):
+    """Smooth, colorful stand-in for a generated poster background"""
+    rng = random.Random(seed)
+    noise = Image.effect_noise((max(1, width // 16), max(1, height // 16)), 48 + rng.randint(0, 32))
+    return Image.merge("RGB", [
+        noise.resize((width, height), Image.BILINEAR),
+        Image.linear_gradient("L").rotate(rng.choice([0, 90, 180, 270])).resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+    ])
+
+
+class StubImageServer:
+    """Threaded HTTP server that mimics the image backend
+
+    script is a list of (status, headers) responses served, in order, to
+    the first requests. chunked=True streams images without a
+    Content-Length. request_times records when each request arrived.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, failure_status=503, script=(), chunked=False):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.script = deque(script)
+        self.chunked = chunked
+        self.requests = 0
+        self.request_times = []
+        self._bodies = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def body(self, width, height, seed):
+        key = (width, height, seed)
+        with self._lock:
+            data = self._bodies.get(key)
+        if data is None:
+            buf = BytesIO()
+            make_test_image(width, height, seed).save(buf, format="JPEG", quality=90)
+            data = buf.getvalue()
+            with self._lock:
+                self._bodies[key] = data
+        return data
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            self.request_times.append(time.monotonic())
+            scripted = self.script.popleft() if self.script else None
+        if self.latency:
+            time.sleep(self.latency)
+        if scripted is not None or (self.failure_rate and random.random() < self.failure_rate):
+            status, headers = scripted or (self.failure_status, {})
+            handler.send_response(status)
+            for name, value in headers.items():
+                handler.send_header(name, value)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(handler.path).query))
+        data = self.body(int(query.get("width", 512)), int(query.get("height", 512)), int(query.get("seed", 0)))
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        if self.chunked:
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            for start in range(0, len(data), 16 * 1024):
+                chunk = data[start:start + 16 * 1024]
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            handler.wfile.write(b"0\r\n\r\n")
+            return
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,245 @@
+"""Offline benchmark suite for every stage of the Create-tab pipeline
+
+Runs prompt build, fetch/decode (against a local stub server), effects,
+text with 1-4 layers, a text-only restyle and every download export for
+each size preset, and reports wall time, peak RSS growth and allocations
+per stage.
+
+Run from the repository root:
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json [--threshold 0.25]
+
+With --compare the exit status is 1 when any stage regressed past the
+threshold, so the suite can gate CI.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from io import BytesIO
+
+import PIL
+from PIL import Image
+
+from benchmarks.stub_server import StubImageServer
+from utils.backends import pollinations_url
+from utils.color import ColorPipeline
+from utils.export import EXPORT_FORMATS, encode_variant
+from utils.http_client import ImageHttpClient
+from utils.image_cache import make_cache_key
+from utils.presets import SIZE_PRESETS, is_large_format
+from utils.prompts import build_full_prompt, enhance_prompt
+from utils.render import DesignLayers, add_text_to_image, build_text_layers
+
+PROMPT = "Vibrant college cultural festival poster with dancing silhouettes, colorful lights"
+STYLE = "Bold & Colorful"
+TEXTS = {
+    "main_text": "College Fest 2024",
+    "subtext": "Join us for the biggest celebration!",
+    "bottom_text": "Date: Dec 25 | Venue: Campus Ground",
+    "contact_info": "Contact: +91 98765 43210",
+}
+MB = 1024 * 1024
+
+# Ignore regressions smaller than these absolute amounts (timer/RSS noise)
+MIN_TIME_DELTA_MS = 2.0
+MIN_RSS_DELTA_MB = 8.0
+
+
+def current_rss():
+    """Resident set size in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Background thread recording the peak RSS while a stage runs"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        if self.baseline is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.baseline is not None:
+            self._thread.join()
+            rss = current_rss()
+            self.peak = max(self.peak, rss)
+
+    @property
+    def growth_mb(self):
+        if self.baseline is None:
+            return None
+        return (self.peak - self.baseline) / MB
+
+
+def measure(fn, repeat):
+    """Time fn, then run it once more under memory instrumentation"""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    pil_before = Image.core.get_stats()["new_count"]
+    tracemalloc.start()
+    with RssSampler() as sampler:
+        fn()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "peak_rss_mb": None if sampler.growth_mb is None else round(sampler.growth_mb, 2),
+        "py_alloc_peak_kb": round(py_peak / 1024, 1),
+        "image_allocs": Image.core.get_stats()["new_count"] - pil_before,
+    }
+
+
+def preset_stages(width, height, server_url, client):
+    """(name, callable) pairs for every stage of one preset"""
+    full_prompt = build_full_prompt(enhance_prompt(PROMPT, True, False, True), STYLE)
+    url = pollinations_url(full_prompt, width, height, seed=42, base_url=server_url)
+
+    def fetch_decode():
+        image = Image.open(BytesIO(client.fetch(url)))
+        image.load()
+        return image
+
+    base = fetch_decode()
+    layers = build_text_layers("Top & Bottom", text_size=50, **TEXTS)
+    pipeline = ColorPipeline(1.1, 1.2, 1.3)
+    effects = {"brightness": 1.1, "contrast": 1.2, "saturation": 1.3}
+    design = DesignLayers(base, memory_bounded=is_large_format(width, height))
+    headlines = itertools.cycle([TEXTS["main_text"], TEXTS["main_text"].replace("Fest", "Night")])
+
+    stages = [
+        ("prompt", lambda: make_cache_key(build_full_prompt(enhance_prompt(PROMPT, True, False, True), STYLE),
+                                          width, height, STYLE)),
+        ("fetch_decode", fetch_decode),
+        ("effects", lambda: pipeline.apply(base)),
+    ]
+    for count in range(1, 5):
+        stages.append((f"text_{count}", lambda count=count: add_text_to_image(
+            base, layers[:count], "Top & Bottom", "#FFFFFF", "#000000")))
+    # Text-only edit on cached layers (the Restyle button)
+    stages.append(("restyle", lambda: design.compose(effects, text_position="Top & Bottom", text_size=50,
+                                                     **dict(TEXTS, main_text=next(headlines)))))
+    for name, (format, max_size, quality, _) in EXPORT_FORMATS.items():
+        stages.append((f"export_{name}", lambda format=format, max_size=max_size, quality=quality:
+                       encode_variant(base, format, max_size, quality)))
+    return stages
+
+
+def run_suite(presets, repeat, stage_filter=None, progress=True):
+    results = {}
+    with StubImageServer() as server:
+        client = ImageHttpClient(max_retries=0)
+        for preset in presets:
+            width, height = SIZE_PRESETS[preset]
+            results[preset] = {}
+            for name, fn in preset_stages(width, height, server.url, client):
+                if stage_filter and name not in stage_filter:
+                    continue
+                results[preset][name] = measure(fn, repeat)
+            if progress:
+                print_preset(preset, width, height, results[preset])
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def print_preset(preset, width, height, stages):
+    print(f"\n{preset} ({width}x{height})")
+    print(f"  {'stage':<18}{'wall ms':>10}{'min ms':>10}{'peak RSS MB':>13}{'py peak KB':>12}{'img allocs':>12}")
+    for name, m in stages.items():
+        rss = "n/a" if m["peak_rss_mb"] is None else f"{m['peak_rss_mb']:.1f}"
+        print(f"  {name:<18}{m['wall_ms']:>10.1f}{m['min_ms']:>10.1f}{rss:>13}{m['py_alloc_peak_kb']:>12.1f}"
+              f"{m['image_allocs']:>12}")
+
+
+def compare(current, baseline, threshold):
+    """Return a list of human-readable regressions versus a baseline run"""
+    regressions = []
+    for preset, stages in current["results"].items():
+        for name, m in stages.items():
+            base = baseline["results"].get(preset, {}).get(name)
+            if base is None:
+                continue
+            if (m["wall_ms"] > base["wall_ms"] * (1 + threshold)
+                    and m["wall_ms"] - base["wall_ms"] > MIN_TIME_DELTA_MS):
+                regressions.append(f"{preset} / {name}: wall {base['wall_ms']:.1f} -> {m['wall_ms']:.1f} ms")
+            if (m["peak_rss_mb"] is not None and base.get("peak_rss_mb") is not None
+                    and m["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold)
+                    and m["peak_rss_mb"] - base["peak_rss_mb"] > MIN_RSS_DELTA_MB):
+                regressions.append(f"{preset} / {name}: peak RSS {base['peak_rss_mb']:.1f} -> "
+                                   f"{m['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the render pipeline")
+    parser.add_argument("--presets", nargs="+", default=list(SIZE_PRESETS), choices=list(SIZE_PRESETS))
+    parser.add_argument("--stages", nargs="+", help="only run these stages (e.g. effects text_4)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write this run's results to a JSON file")
+    parser.add_argument("--save-baseline", help="write this run as the new JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (default 0.25)")
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.presets, args.repeat, args.stages)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            print(f"\n💾 Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed more than {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ No stage regressed more than {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Lets plain `pytest` from the project root import utils and benchmarks"""
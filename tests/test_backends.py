@@ -0,0 +1,36 @@
+"""hedge(): falling back from a slow or failing primary"""
+import threading
+
+import pytest
+
+from utils.backends import hedge
+from utils.http_client import ImageFetchError
+from utils.scheduler import SchedulerBusy
+
+
+def test_slow_primary_falls_back_with_timeout_reason():
+    release = threading.Event()
+    try:
+        assert hedge(release.wait, lambda: "local", 0.05) == ("local", "timeout")
+    finally:
+        release.set()
+
+
+def test_fast_primary_wins():
+    assert hedge(lambda: "remote", lambda: "local", 5) == ("remote", None)
+
+
+def test_transient_failure_falls_back():
+    def primary():
+        raise ImageFetchError("busy", status_code=503)
+
+    assert hedge(primary, lambda: "local", 5) == ("local", "ImageFetchError")
+
+
+@pytest.mark.parametrize("error", [SchedulerBusy("queue full"), ImageFetchError("bad prompt", status_code=400)])
+def test_final_errors_are_raised(error):
+    def primary():
+        raise error
+
+    with pytest.raises(type(error)):
+        hedge(primary, lambda: "local", 5)
@@ -0,0 +1,105 @@
+"""ImageHttpClient against the local stub image server"""
+import socket
+import time
+
+import pytest
+
+from benchmarks.stub_server import StubImageServer
+from utils.http_client import ImageFetchError, ImageHttpClient
+
+
+def image_url(server, width=256, height=256, seed=1):
+    return f"{server.url}/prompt/test?width={width}&height={height}&seed={seed}"
+
+
+def make_client(**kwargs):
+    options = {"max_retries": 3, "backoff_base": 0.01, "connect_timeout": 2.0, "read_timeout": 5.0}
+    options.update(kwargs)
+    return ImageHttpClient(**options)
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_busy_responses_are_retried_after_retry_after(status):
+    script = [(status, {"Retry-After": "0.3"}), (status, {"Retry-After": "0.3"})]
+    with StubImageServer(script=script) as server:
+        data = make_client().fetch(image_url(server))
+    assert data == server.body(256, 256, 1)
+    assert server.requests == 3
+    gaps = [b - a for a, b in zip(server.request_times, server.request_times[1:])]
+    assert all(gap >= 0.25 for gap in gaps)
+
+
+def test_retry_after_is_capped_at_backoff_max():
+    with StubImageServer(script=[(503, {"Retry-After": "60"})]) as server:
+        start = time.monotonic()
+        make_client(backoff_max=0.2).fetch(image_url(server))
+    assert time.monotonic() - start < 5
+    assert server.requests == 2
+
+
+def test_gives_up_after_max_retries():
+    with StubImageServer(script=[(503, {})] * 4) as server:
+        with pytest.raises(ImageFetchError) as error:
+            make_client(max_retries=2).fetch(image_url(server))
+    assert error.value.status_code == 503
+    assert server.requests == 3
+
+
+@pytest.mark.parametrize("status", [400, 404])
+def test_client_errors_are_not_retried(status):
+    with StubImageServer(script=[(status, {})]) as server:
+        with pytest.raises(ImageFetchError) as error:
+            make_client().fetch(image_url(server))
+    assert error.value.status_code == status
+    assert server.requests == 1
+
+
+@pytest.mark.parametrize("chunked", [False, True], ids=["content-length", "chunked"])
+def test_body_within_max_bytes_is_returned(chunked):
+    with StubImageServer(chunked=chunked) as server:
+        expected = server.body(256, 256, 1)
+        data = make_client(max_bytes=len(expected)).fetch(image_url(server))
+    assert data == expected
+
+
+@pytest.mark.parametrize("chunked, message", [(False, "too large"), (True, "larger than")],
+                         ids=["content-length", "chunked"])
+def test_body_over_max_bytes_is_rejected(chunked, message):
+    with StubImageServer(chunked=chunked) as server:
+        max_bytes = len(server.body(256, 256, 1)) - 1
+        with pytest.raises(ImageFetchError, match=message):
+            make_client(max_bytes=max_bytes, chunk_size=1024).fetch(image_url(server))
+    # An oversized image is the backend's answer, not a transient failure
+    assert server.requests == 1
+
+
+def test_read_timeout():
+    with StubImageServer(latency=1.0) as server:
+        start = time.monotonic()
+        with pytest.raises(ImageFetchError, match="ReadTimeout"):
+            make_client(max_retries=0, read_timeout=0.2).fetch(image_url(server))
+    assert time.monotonic() - start < 1.0
+
+
+def test_connect_timeout():
+    # A listener that never accepts: once its backlog is full, new
+    # connection attempts are left waiting for the handshake
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    host, port = listener.getsockname()
+    fillers = []
+    try:
+        for _ in range(8):
+            filler = socket.socket()
+            filler.setblocking(False)
+            filler.connect_ex((host, port))
+            fillers.append(filler)
+        start = time.monotonic()
+        with pytest.raises(ImageFetchError, match="ConnectTimeout"):
+            make_client(max_retries=0, connect_timeout=0.3).fetch(f"http://{host}:{port}/prompt/test")
+        assert time.monotonic() - start < 2.0
+    finally:
+        for filler in fillers:
+            filler.close()
+        listener.close()
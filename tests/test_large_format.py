@@ -0,0 +1,15 @@
+"""Peak memory of finishing an A3 design the way the app does"""
+import pytest
+
+from benchmarks.bench_large_format import measure, peak_rss_supported, poster_bytes
+
+# Allowed peak growth, in decoded-image sizes, on top of the held base
+CEILING = 1.5
+
+pytestmark = pytest.mark.skipif(not peak_rss_supported(), reason="needs Linux /proc peak-RSS accounting")
+
+
+def test_a3_compose_and_save_stays_under_ceiling():
+    data, image_mb = poster_bytes("A3 Poster")
+    growth, _ = measure("streamed", data)
+    assert growth <= CEILING * image_mb, f"peaked {growth:.1f} MB above baseline ({growth / image_mb:.2f}x)"
@@ -0,0 +1,55 @@
+"""Base image fetching: only readable images reach the image cache"""
+from io import BytesIO
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from utils.backends import ImageBackend
+from utils.image_cache import ImageCache
+from utils.render import fetch_base_image, fetch_image_bytes, request_key
+
+
+class StaticBackend(ImageBackend):
+    name = "static"
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def fetch(self, prompt, width, height, style="", seed=None):
+        self.calls += 1
+        return self.data
+
+
+def png_bytes(size=(32, 32)):
+    buf = BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_readable_image_is_cached(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    backend = StaticBackend(png_bytes())
+    for _ in range(2):
+        assert fetch_image_bytes("poster", 32, 32, seed=1, cache=cache, backend=backend) == backend.data
+    assert backend.calls == 1
+
+
+@pytest.mark.parametrize("data", [b"<html>Service Unavailable</html>", png_bytes()[:-20]],
+                         ids=["error-page", "truncated"])
+def test_unreadable_response_is_not_cached(tmp_path, data):
+    cache = ImageCache(str(tmp_path))
+    with pytest.raises(UnidentifiedImageError):
+        fetch_image_bytes("poster", 32, 32, seed=1, cache=cache, backend=StaticBackend(data))
+    assert not cache.contains(request_key("poster", 32, 32, seed=1))
+
+
+def test_undecodable_cache_hit_is_dropped(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    key = request_key("poster", 32, 32, seed=1)
+    cache.put(key, b"not an image")
+    backend = StaticBackend(png_bytes())
+    with pytest.raises(UnidentifiedImageError):
+        fetch_base_image("poster", 32, 32, seed=1, cache=cache, backend=backend)
+    assert not cache.contains(key)
+    assert fetch_base_image("poster", 32, 32, seed=1, cache=cache, backend=backend).size == (32, 32)
@@ -0,0 +1 @@
+"""Helper modules for the AI Meme & Poster Creator app"""
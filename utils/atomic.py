@@ -0,0 +1,37 @@
+"""Atomic file writes: readers see the old file or the new one, never half"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Permissions a plain open() would give new files; mkstemp always uses 0600
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+@contextmanager
+def atomic_open(path, mode="wb", encoding=None):
+    """Write to a temp file beside path and move it into place on success
+
+    `with atomic_open(path) as f: image.save(f, ...)`. The temp file is
+    removed if the write fails, and the finished file gets the usual
+    umask-derived permissions so it can be shared or served.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_atomic(path, data):
+    """Atomically replace path with data (bytes)"""
+    with atomic_open(path) as f:
+        f.write(data)
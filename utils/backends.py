@@ -0,0 +1,259 @@
+"""Image generation backends: Pollinations, a local procedural painter, and hedging between them"""
+import contextvars
+import hashlib
+import math
+import random
+import threading
+import urllib.parse
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from utils import metrics
+from utils.http_client import RETRY_STATUSES, ImageFetchError
+from utils.metrics import span
+from utils.prompts import build_full_prompt, normalize_prompt
+from utils.scheduler import SchedulerBusy
+
+POLLINATIONS_BASE_URL = "https://image.pollinations.ai"
+
+BACKENDS = ("pollinations", "procedural")
+
+# Background colors per visual style, darkest to lightest
+STYLE_PALETTES = {
+    "Modern Minimal": ["#2B2D42", "#8E9AAF", "#CBC0D3", "#EFD3D7", "#F5F5F0"],
+    "Bold & Colorful": ["#3A0CA3", "#8338EC", "#FF006E", "#FB5607", "#FFBE0B"],
+    "Professional": ["#0B2545", "#13315C", "#134074", "#8DA9C4", "#EEF4ED"],
+    "Vintage Retro": ["#2E4057", "#6B4E71", "#D96C4E", "#E9A66C", "#F4E1C1"],
+    "Cyberpunk": ["#0D0221", "#261447", "#F6019D", "#FF3864", "#2DE2E6"],
+    "Anime": ["#7B8CDE", "#A0C4FF", "#BDB2FF", "#FFB5C2", "#FFF1E6"],
+    "Cartoon": ["#1A535C", "#4ECDC4", "#FF6B6B", "#FFE66D", "#F7FFF7"],
+    "3D Render": ["#1B1B3A", "#693668", "#A74482", "#F84AA7", "#FF9EC7"],
+    "Realistic Photo": ["#2F3E46", "#354F52", "#52796F", "#84A98C", "#CAD2C5"],
+}
+
+PATTERNS = ("stripes", "dots", "grid", "waves", "rings", "none")
+
+
+def pollinations_url(full_prompt, width, height, seed=None, base_url=POLLINATIONS_BASE_URL):
+    """Build the Pollinations.ai request URL for a full prompt"""
+    encoded_prompt = urllib.parse.quote(full_prompt)
+    api_url = f"{base_url}/prompt/{encoded_prompt}?width={width}&height={height}&nologo=true&enhance=true"
+    if seed is not None:
+        api_url += f"&seed={seed}"
+    return api_url
+
+
+class ImageBackend:
+    """Something that turns (prompt, size, style, seed) into a base image
+
+    fetch() returns encoded image bytes and generate() a decoded image.
+    Backends whose results are worth keeping set cacheable, which routes
+    them through the shared image cache and request coalescing.
+    """
+
+    name = "backend"
+    cacheable = True
+
+    def fetch(self, prompt, width, height, style="", seed=None):
+        raise NotImplementedError
+
+    def generate(self, prompt, width, height, style="", seed=None):
+        data = self.fetch(prompt, width, height, style, seed)
+        with span("decode"):
+            image = Image.open(BytesIO(data))
+            image.load()
+        return image
+
+
+class PollinationsBackend(ImageBackend):
+    """The Pollinations.ai text-to-image API, reached through an ImageHttpClient-like client"""
+
+    name = "pollinations"
+
+    def __init__(self, client, base_url=POLLINATIONS_BASE_URL):
+        self.client = client
+        self.base_url = base_url
+
+    def fetch(self, prompt, width, height, style="", seed=None):
+        full_prompt = build_full_prompt(prompt, style)
+        return self.client.fetch(pollinations_url(full_prompt, width, height, seed, self.base_url))
+
+
+def _palette_lut(colors):
+    """256-entry lookup tables (one per channel) blending evenly through colors"""
+    rgb = [tuple(int(color[i:i + 2], 16) for i in (1, 3, 5)) for color in colors]
+    tables = ([], [], [])
+    for value in range(256):
+        position = value / 255 * (len(rgb) - 1)
+        low = min(int(position), len(rgb) - 2)
+        t = position - low
+        for channel in range(3):
+            tables[channel].append(round(rgb[low][channel] * (1 - t) + rgb[low + 1][channel] * t))
+    return tables
+
+
+class ProceduralBackend(ImageBackend):
+    """Fast, deterministic local backgrounds: palette gradient, soft noise and a pattern
+
+    The same prompt, style and seed always give the same picture, at any
+    size: every shape is placed relative to the canvas and drawn at no more
+    than work_side pixels before scaling up. That makes it a fallback for a
+    slow upstream and a test double that needs no network.
+    """
+
+    name = "procedural"
+    cacheable = False
+
+    def __init__(self, work_side=1024):
+        self.work_side = work_side
+
+    def _seed(self, prompt, style, seed):
+        payload = f"{normalize_prompt(prompt)}|{style}|{seed}".encode("utf-8")
+        return int.from_bytes(hashlib.sha256(payload).digest()[:8], "big")
+
+    def generate(self, prompt, width, height, style="", seed=None):
+        with span("procedural"):
+            rng = random.Random(self._seed(prompt, style, seed))
+            colors = STYLE_PALETTES.get(style, STYLE_PALETTES["Modern Minimal"])
+            if rng.random() < 0.5:
+                colors = colors[::-1]
+            scale = min(1.0, self.work_side / max(width, height))
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+            field = Image.blend(self._gradient(rng, size), self._noise(rng, size), rng.uniform(0.25, 0.45))
+            image = Image.merge("RGB", [field.point(table) for table in _palette_lut(colors)])
+
+            pattern = self._pattern(rng, size)
+            if pattern is not None:
+                ink = colors[-1] if rng.random() < 0.7 else colors[0]
+                opacity = rng.uniform(0.12, 0.25)
+                image.paste(ink, mask=pattern.point(lambda v: round(v * opacity)))
+
+            if size != (width, height):
+                image = image.resize((width, height), Image.BICUBIC)
+        return image
+
+    def fetch(self, prompt, width, height, style="", seed=None):
+        buf = BytesIO()
+        self.generate(prompt, width, height, style, seed).save(buf, format="PNG", compress_level=1)
+        return buf.getvalue()
+
+    def _gradient(self, rng, size):
+        if rng.random() < 0.6:
+            # Rotate an oversized linear ramp and keep the middle, so no corner is left empty
+            ramp = Image.linear_gradient("L").resize((363, 363))
+            ramp = ramp.rotate(rng.uniform(0, 360), Image.BILINEAR).crop((53, 53, 309, 309))
+        else:
+            glow = Image.radial_gradient("L").resize((512, 512))
+            x, y = rng.randint(64, 192), rng.randint(64, 192)
+            ramp = glow.crop((x, y, x + 256, y + 256))
+        return ramp.resize(size, Image.BILINEAR)
+
+    def _noise(self, rng, size):
+        cells = rng.randint(3, 6)
+        grid = (max(2, round(cells * size[0] / min(size))), max(2, round(cells * size[1] / min(size))))
+        noise = Image.frombytes("L", grid, rng.randbytes(grid[0] * grid[1]))
+        return noise.resize(size, Image.BICUBIC)
+
+    def _pattern(self, rng, size):
+        kind = rng.choice(PATTERNS)
+        if kind == "none":
+            return None
+        width, height = size
+        mask = Image.new("L", size, 0)
+        draw = ImageDraw.Draw(mask)
+        step = max(4, min(size) / rng.randint(8, 16))
+        line = max(1, round(step / rng.randint(4, 8)))
+        if kind == "stripes":
+            offset = 0.0
+            while offset < width + height:
+                draw.line([(offset, 0), (offset - height, height)], fill=255, width=line)
+                offset += step
+        elif kind == "dots":
+            radius = step / 5
+            for row, y in enumerate(_steps(step / 2, height, step)):
+                shift = step / 2 if row % 2 else 0
+                for x in _steps(shift, width, step):
+                    draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=255)
+        elif kind == "grid":
+            for x in _steps(0, width, step):
+                draw.line([(x, 0), (x, height)], fill=255, width=line)
+            for y in _steps(0, height, step):
+                draw.line([(0, y), (width, y)], fill=255, width=line)
+        elif kind == "waves":
+            amplitude = step / 3
+            period = rng.uniform(0.5, 1.5) * min(size)
+            for y in _steps(0, height + step, step):
+                points = [(x, y + amplitude * math.sin(2 * math.pi * x / period)) for x in range(0, width + 8, 8)]
+                draw.line(points, fill=255, width=line)
+        else:
+            cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+            for radius in _steps(step, math.hypot(width, height), step):
+                draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], outline=255, width=line)
+        return mask
+
+
+def _steps(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+
+
+def make_backend(name, client=None):
+    """Build a backend by name (see BACKENDS)"""
+    if name == "pollinations":
+        return PollinationsBackend(client)
+    if name == "procedural":
+        return ProceduralBackend()
+    raise ValueError(f"Unknown backend {name!r} (choose from {', '.join(BACKENDS)})")
+
+
+def is_final_error(error):
+    """True for failures a fallback must not hide: shed requests and rejected prompts"""
+    if isinstance(error, SchedulerBusy):
+        return True
+    status = getattr(error, "status_code", None)
+    return (isinstance(error, ImageFetchError) and status is not None and 400 <= status < 500
+            and status not in RETRY_STATUSES)
+
+
+def hedge(primary, fallback, budget, on_thread=None):
+    """Return (primary(), None), or (fallback(), reason) if primary is too slow or fails
+
+    primary runs on its own daemon thread. If it has not finished within
+    budget seconds, fallback runs on the calling thread; should primary
+    complete in the meantime its result still wins. A primary that is
+    given up on keeps running, so a cacheable backend can finish warming
+    the cache for the next attempt. Errors for which is_final_error() holds
+    are raised instead of falling back. on_thread(thread) is called before
+    the thread starts (e.g. to attach a Streamlit script context).
+    """
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(primary))
+        except BaseException as e:
+            future.set_exception(e)
+
+    thread = threading.Thread(target=run, name="hedged-primary", daemon=True)
+    if on_thread is not None:
+        on_thread(thread)
+    thread.start()
+    try:
+        return future.result(timeout=budget), None
+    except FutureTimeout:
+        reason = "timeout"
+    except Exception as e:
+        if is_final_error(e):
+            raise
+        reason = type(e).__name__
+    result = fallback()
+    if future.done() and future.exception() is None:
+        return future.result(), None
+    metrics.inc("meme_backend_fallbacks_total", reason=reason)
+    return result, reason
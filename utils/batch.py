@@ -0,0 +1,283 @@
+"""Headless batch rendering of poster jobs from a CSV or JSONL file
+
+Usage (from the project root):
+    python -m utils.batch jobs.csv --output out/ [--workers N] [--fetch-concurrency M]
+                                            [--backend procedural]
+
+Each row/line describes one design: prompt, style, preset (or width/height),
+main_text, subtext, bottom_text, contact_info, text_position, text_size,
+text_color, outline_color, outline_width, text_shadow, brightness, contrast,
+saturation, hue, gamma, vignette, energy, professional, fun, seed, formats
+and name. Only prompt is required; everything else defaults to the app's
+sidebar defaults. The procedural backend renders offline, which is handy
+for checking a job file or the render pipeline without the image service.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from io import BytesIO
+
+from PIL import Image
+
+from utils.backends import BACKENDS, make_backend
+from utils.export import EXPORT_FORMATS, write_variant
+from utils.http_client import ImageHttpClient
+from utils.image_cache import DEFAULT_CACHE_DIR, ImageCache
+from utils.presets import SIZE_PRESETS
+from utils.prompts import STYLE_MAP, enhance_prompt
+from utils.render import compose_design, fetch_image_bytes, request_key
+from utils.singleflight import SingleFlight
+
+# Large enough for the A3 preset (3508x4961)
+MAX_SIDE = 5120
+TEXT_POSITIONS = ["Top", "Bottom", "Center", "Top & Bottom", "None"]
+EFFECT_DEFAULTS = {
+    "brightness": 1.0,
+    "contrast": 1.0,
+    "saturation": 1.0,
+    "hue": 0.0,
+    "gamma": 1.0,
+    "vignette": 0.0,
+}
+
+
+def _value(raw, key, default=None):
+    value = raw.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    return value.strip() if isinstance(value, str) else value
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "on")
+    return bool(value)
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [part.strip().lower() for part in re.split(r"[,;|]", value) if part.strip()]
+    return [str(part).lower() for part in value]
+
+
+def normalize_job(raw, index):
+    """Validate one job row and fill in the app's defaults (raises ValueError)"""
+    prompt = _value(raw, "prompt")
+    if not prompt:
+        raise ValueError("missing prompt")
+
+    style = _value(raw, "style", "Modern Minimal")
+    if style not in STYLE_MAP:
+        raise ValueError(f"unknown style {style!r}")
+
+    preset = _value(raw, "preset", "Instagram Post (1:1)")
+    if preset not in SIZE_PRESETS:
+        raise ValueError(f"unknown preset {preset!r}")
+    width, height = SIZE_PRESETS[preset]
+    width = int(_value(raw, "width", width))
+    height = int(_value(raw, "height", height))
+    if not (64 <= width <= MAX_SIDE and 64 <= height <= MAX_SIDE):
+        raise ValueError(f"size {width}x{height} out of range")
+
+    text_position = _value(raw, "text_position", "Top")
+    if text_position not in TEXT_POSITIONS:
+        raise ValueError(f"unknown text_position {text_position!r}")
+
+    formats = _as_list(_value(raw, "formats", "png"))
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"unknown formats {unknown}")
+
+    effects = {key: float(_value(raw, key, default)) for key, default in EFFECT_DEFAULTS.items()}
+    seed = _value(raw, "seed")
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", str(_value(raw, "name", f"design_{index + 1:04d}")))
+
+    return {
+        "index": index,
+        "name": name,
+        "prompt": enhance_prompt(
+            prompt,
+            _as_bool(_value(raw, "energy", False)),
+            _as_bool(_value(raw, "professional", False)),
+            _as_bool(_value(raw, "fun", False)),
+        ),
+        "style": style,
+        "width": width,
+        "height": height,
+        "seed": int(seed) if seed is not None else None,
+        "formats": formats,
+        "design": {
+            "main_text": _value(raw, "main_text", ""),
+            "subtext": _value(raw, "subtext", ""),
+            "bottom_text": _value(raw, "bottom_text", ""),
+            "contact_info": _value(raw, "contact_info", ""),
+            "text_position": text_position,
+            "text_size": int(_value(raw, "text_size", 50)),
+            "text_color": _value(raw, "text_color", "#FFFFFF"),
+            "outline_color": _value(raw, "outline_color", "#000000"),
+            "outline_width": int(_value(raw, "outline_width", 3)),
+            "text_shadow": _as_bool(_value(raw, "text_shadow", False)),
+            "effects": effects if effects != EFFECT_DEFAULTS else None,
+        },
+    }
+
+
+def load_jobs(path):
+    """Read raw job dicts from a .csv or .jsonl file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def render_job(job, data, output_dir):
+    """Decode, compose and write every requested format (runs in a worker process)"""
+    start = time.perf_counter()
+    image = Image.open(BytesIO(data))
+    scale = 1.0
+    sizes = [EXPORT_FORMATS[fmt][1] for fmt in job["formats"]]
+    if all(sizes):
+        # Only downscaled outputs: let JPEG decode at a reduced scale and compose there
+        box = (max(size[0] for size in sizes), max(size[1] for size in sizes))
+        fit = min(1.0, box[0] / image.width, box[1] / image.height)
+        full_width = image.width
+        image.draft("RGB", (round(image.width * fit), round(image.height * fit)))
+        scale = image.width / full_width
+    # The decoded image is private to this job, so compose it in place
+    image = compose_design(image, scale=scale, in_place=True, **job["design"])
+    files = []
+    for fmt in job["formats"]:
+        format, max_size, quality, suffix = EXPORT_FORMATS[fmt]
+        path = os.path.join(output_dir, job["name"] + suffix)
+        write_variant(image, path, format, max_size, quality)
+        files.append(path)
+    return {"files": files, "render_s": time.perf_counter() - start}
+
+
+def _fetch(job, cache, backend, flights):
+    start = time.perf_counter()
+    args = (job["prompt"], job["width"], job["height"], job["style"], job["seed"])
+    data = flights.do(request_key(*args), lambda: fetch_image_bytes(*args, cache, backend=backend))
+    return data, time.perf_counter() - start
+
+
+def _print_progress(done, total, result):
+    if result["ok"]:
+        status = f"ok (fetch {result['fetch_s']:.1f}s, render {result['render_s']:.1f}s)"
+    else:
+        status = f"FAILED: {result['error']}"
+    print(f"[{done}/{total}] {result['name']}: {status}", file=sys.stderr, flush=True)
+
+
+def run_batch(raw_jobs, output_dir, workers=None, fetch_concurrency=4, cache=None, client=None,
+              progress=_print_progress, backend=None):
+    """Render every job, fetching on a thread pool and composing on a process pool
+
+    Fetches and renders are pipelined with a bounded number of jobs in
+    flight, and each finished design is written to output_dir as soon as
+    it is ready. Returns a summary dict (also saved as summary.json).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    backend = backend or make_backend("pollinations", client or ImageHttpClient(pool_size=fetch_concurrency))
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = fetch_concurrency + 2 * workers
+    flights = SingleFlight("batch_fetch")
+    total = len(raw_jobs)
+    results = []
+    start = time.perf_counter()
+
+    def finish(result):
+        results.append(result)
+        if progress:
+            progress(len(results), total, result)
+
+    pending = iter(enumerate(raw_jobs))
+    with ThreadPoolExecutor(fetch_concurrency) as fetch_pool, ProcessPoolExecutor(workers) as cpu_pool:
+        fetches = {}
+        renders = {}
+
+        def refill():
+            while len(fetches) + len(renders) < max_in_flight:
+                try:
+                    index, raw = next(pending)
+                except StopIteration:
+                    return
+                try:
+                    job = normalize_job(raw, index)
+                except (ValueError, TypeError) as e:
+                    name = str(raw.get("name") or f"design_{index + 1:04d}")
+                    finish({"index": index, "name": name, "ok": False, "error": str(e)})
+                    continue
+                fetches[fetch_pool.submit(_fetch, job, cache, backend, flights)] = job
+
+        refill()
+        while fetches or renders:
+            done, _ = wait(list(fetches) + list(renders), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetches:
+                    job = fetches.pop(future)
+                    try:
+                        data, fetch_s = future.result()
+                    except Exception as e:
+                        finish({"index": job["index"], "name": job["name"], "ok": False, "error": str(e)})
+                        continue
+                    job["fetch_s"] = fetch_s
+                    job["bytes_fetched"] = len(data)
+                    renders[cpu_pool.submit(render_job, job, data, output_dir)] = job
+                else:
+                    job = renders.pop(future)
+                    result = {"index": job["index"], "name": job["name"], "fetch_s": job["fetch_s"],
+                              "bytes_fetched": job["bytes_fetched"]}
+                    try:
+                        result.update(future.result(), ok=True)
+                    except Exception as e:
+                        result.update(ok=False, error=str(e))
+                    finish(result)
+            refill()
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for result in results if result["ok"])
+    summary = {
+        "total": total,
+        "succeeded": succeeded,
+        "failed": total - succeeded,
+        "elapsed_s": round(elapsed, 3),
+        "designs_per_minute": round(succeeded / elapsed * 60, 1) if elapsed else 0.0,
+        "results": sorted(results, key=lambda result: result["index"]),
+    }
+    summary["coalesced_fetches"] = flights.stats()["saved"]
+    if cache is not None:
+        summary["cache"] = cache.stats()
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render posters in bulk from a CSV or JSONL job file")
+    parser.add_argument("jobs", help="path to a .csv or .jsonl job file")
+    parser.add_argument("-o", "--output", default="batch_output", help="directory for rendered files")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("-f", "--fetch-concurrency", type=int, default=4, help="parallel image downloads")
+    parser.add_argument("--cache-dir", default=os.environ.get("MEME_IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true", help="always fetch fresh base images")
+    parser.add_argument("--backend", default="pollinations", choices=BACKENDS,
+                        help="where base images come from (procedural needs no network)")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ImageCache(args.cache_dir)
+    backend = make_backend(args.backend, ImageHttpClient(pool_size=args.fetch_concurrency))
+    summary = run_batch(load_jobs(args.jobs), args.output, args.workers, args.fetch_concurrency, cache=cache,
+                        backend=backend)
+    print(f"✅ {summary['succeeded']}/{summary['total']} designs rendered in {summary['elapsed_s']:.1f}s "
+          f"({summary['failed']} failed) -> {os.path.join(args.output, 'summary.json')}")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Streaming ZIP bundles of a design in every platform size and format"""
+import os
+import re
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageFilter, ImageOps
+
+from utils import metrics
+from utils.export import EXPORT_FORMATS, downscale, encode_variant
+from utils.metrics import span
+from utils.presets import SIZE_PRESETS
+
+# The platform sizes from SIZE_PRESETS (print sizes and Custom are left out)
+SOCIAL_PRESETS = ("Instagram Post (1:1)", "Instagram Story", "Facebook Post", "Twitter Post")
+BUNDLE_FORMATS = ("png", "jpeg", "webp")
+SMALL_VARIANTS = ("web", "whatsapp")
+
+
+def _slug(text, max_length=40):
+    slug = re.sub(r"[^a-z0-9]+", "-", text.casefold()).strip("-")
+    return slug[:max_length].rstrip("-") or "design"
+
+
+def fit_to_canvas(image, size):
+    """Fit the whole design inside size, filling the margins with a blurred copy
+
+    Nothing is cropped, so headlines survive a change of aspect ratio.
+    """
+    if image.size == size:
+        return image
+    # Blur a tiny cover-cropped copy and scale it up: cheap at any size
+    small = (max(1, size[0] // 8), max(1, size[1] // 8))
+    backdrop = ImageOps.fit(image.convert("RGB"), small, Image.BILINEAR)
+    canvas = backdrop.filter(ImageFilter.GaussianBlur(4)).resize(size, Image.BILINEAR)
+    scale = min(size[0] / image.width, size[1] / image.height)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    design = downscale(image, target) if scale < 1 else image.resize(target, Image.LANCZOS)
+    canvas.paste(design.convert("RGB"), ((size[0] - design.width) // 2, (size[1] - design.height) // 2))
+    return canvas
+
+
+def _file_name(stem, fmt):
+    return f"{stem}.{EXPORT_FORMATS[fmt][3].rsplit('.', 1)[1]}"
+
+
+def bundle_units(presets=SOCIAL_PRESETS, formats=BUNDLE_FORMATS, small=SMALL_VARIANTS):
+    """Encoding jobs for one design: (target size or None, [(file name, export format key)])
+
+    Each platform size is resized once and then encoded in every format;
+    the full-size formats are separate jobs because they are the slow ones.
+    """
+    units = [(None, [(_file_name("original", fmt), fmt)]) for fmt in formats]
+    for preset in presets:
+        units.append((SIZE_PRESETS[preset], [(_file_name(_slug(preset), fmt), fmt) for fmt in formats]))
+    if small:
+        units.append((None, [(_file_name(fmt, fmt), fmt) for fmt in small]))
+    return units
+
+
+def _encode_unit(image, size, files):
+    with span("bundle_encode"):
+        if size is not None:
+            image = fit_to_canvas(image, size)
+        encoded = []
+        for name, fmt in files:
+            format, max_size, quality, _ = EXPORT_FORMATS[fmt]
+            encoded.append((name, encode_variant(image, format, max_size, quality)))
+        return encoded
+
+
+def write_bundle(designs, out, units=None, workers=None):
+    """Write a ZIP with every variant of every design to the binary file object out
+
+    designs is an iterable of (name, load_image) pairs; each image is
+    loaded only when its turn comes. Variants are encoded on a thread pool
+    (Pillow releases the GIL while resizing and encoding) and written to
+    the archive in order as soon as they are ready, with a bounded number
+    in flight, so memory stays flat however many designs are bundled. out
+    may be a non-seekable stream. Returns a summary dict.
+    """
+    units = units if units is not None else bundle_units()
+    workers = workers or os.cpu_count() or 1
+    max_pending = 2 * workers
+    stats = {"designs": 0, "files": 0, "bytes": 0}
+    start = time.perf_counter()
+    pending = deque()
+
+    # Images are already compressed, so entries are stored rather than deflated
+    with ThreadPoolExecutor(workers, thread_name_prefix="bundle") as pool, \
+            zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as archive:
+
+        def write_next():
+            folder, future = pending.popleft()
+            for name, data in future.result():
+                info = zipfile.ZipInfo(f"{folder}/{name}", time.localtime()[:6])
+                archive.writestr(info, data)
+                stats["files"] += 1
+                stats["bytes"] += len(data)
+
+        used = set()
+        for name, load_image in designs:
+            folder = _slug(name)
+            while folder in used:
+                folder += "-1"
+            used.add(folder)
+            image = load_image()
+            image.load()
+            for size, files in units:
+                while len(pending) >= max_pending:
+                    write_next()
+                pending.append((folder, pool.submit(_encode_unit, image, size, files)))
+            stats["designs"] += 1
+            del image
+        while pending:
+            write_next()
+
+    stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+    metrics.inc("meme_bundle_files_total", stats["files"])
+    return stats
+
+
+def bundle_bytes(designs, **kwargs):
+    """Build a bundle in a temporary file and return the finished archive's bytes
+
+    Only the finished ZIP is ever held in memory (once), not the archive
+    while it grows; callers that hand it to a browser in one piece should
+    cap how many designs go into it.
+    """
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write_bundle(designs, out, **kwargs)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
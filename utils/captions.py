@@ -0,0 +1,50 @@
+"""Caption ideas for the AI Caption Generator tab"""
+
+CAPTION_TYPES = ("Event Headline", "Catchy Tagline", "Call to Action", "Funny Meme Text", "Motivational Quote", "Event Details")
+
+# (template, stand-in used when no theme is given); {context} is filled with the theme
+CAPTION_BANK = {
+    "Event Headline": [
+        ("🎯 {context} - DON'T MISS OUT!", "YOUR EVENT"),
+        ("🔥 THE BIGGEST {context} OF THE YEAR", "EVENT"),
+        ("⚡ {context} - LIMITED SPOTS!", "JOIN US"),
+    ],
+    "Catchy Tagline": [
+        ("Where Innovation Meets Celebration! 🚀", None),
+        ("Making Memories, Building Futures! ✨", None),
+        ("Your Journey Begins Here! 🎓", None),
+    ],
+    "Call to Action": [
+        ("REGISTER NOW - Spots Filling Fast! 📝", None),
+        ("Join Us & Be Part of Something Amazing! 🌟", None),
+        ("Don't Wait - Secure Your Spot Today! ⚡", None),
+    ],
+    "Funny Meme Text": [
+        ("WHEN THE DEADLINE IS TONIGHT\nBUT NETFLIX IS LIFE 😅", None),
+        ("ME: I'LL START STUDYING\nALSO ME: *SCROLLS FOR 3 HOURS* 📱", None),
+        ("ASSIGNMENT DUE TOMORROW\nME: TIME TO PANIC! 😱", None),
+    ],
+    "Motivational Quote": [
+        ("Dream Big. Work Hard. Stay Focused. 💪", None),
+        ("Success Begins Where Comfort Zone Ends! 🎯", None),
+        ("Your Only Limit Is You! 🚀", None),
+    ],
+    "Event Details": [
+        ("📅 Date: [Your Date]\n📍 Venue: [Your Venue]\n⏰ Time: [Your Time]\n📞 Contact: [Your Number]", None),
+        ("🎯 What: {context}\n🕐 When: [Date & Time]\n📍 Where: [Location]\n💰 Entry: [Free/Paid]", "[Event Name]"),
+    ],
+}
+
+# Caption types that shout the theme
+UPPERCASE_TYPES = {"Event Headline"}
+
+
+def caption_ideas(caption_type, context=""):
+    """Suggestions of one type, filled in with the user's event or theme"""
+    context = context.strip()
+    if context and caption_type in UPPERCASE_TYPES:
+        context = context.upper()
+    return [
+        template.format(context=context or fallback) if fallback is not None else template
+        for template, fallback in CAPTION_BANK.get(caption_type, [])
+    ]
@@ -0,0 +1,168 @@
+"""Fused color adjustments (brightness, contrast, saturation, hue, gamma, vignette)"""
+import math
+
+from PIL import Image
+
+# Rows per band for in-place processing of large images
+STRIP_HEIGHT = 256
+
+# ITU-R 601-2 luma weights, the same ones Pillow uses for convert("L")
+LUMA = (0.299, 0.587, 0.114)
+
+
+def _matmul(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+
+
+def saturation_matrix(factor):
+    """3x3 matrix equivalent to ImageEnhance.Color(factor)"""
+    return [[(1 - factor) * LUMA[j] + (factor if i == j else 0) for j in range(3)] for i in range(3)]
+
+
+def hue_matrix(degrees):
+    """3x3 luminance-preserving hue rotation"""
+    c = math.cos(math.radians(degrees))
+    s = math.sin(math.radians(degrees))
+    return [
+        [0.213 + c * 0.787 - s * 0.213, 0.715 - c * 0.715 - s * 0.715, 0.072 - c * 0.072 + s * 0.928],
+        [0.213 - c * 0.213 + s * 0.143, 0.715 + c * 0.285 + s * 0.140, 0.072 - c * 0.072 - s * 0.283],
+        [0.213 - c * 0.213 - s * 0.787, 0.715 - c * 0.715 + s * 0.715, 0.072 + c * 0.928 + s * 0.072],
+    ]
+
+
+def _clip8(value):
+    return 0 if value < 0 else 255 if value > 255 else int(value + 0.5)
+
+
+def _blend8(value):
+    # Image.blend truncates instead of rounding
+    return 0 if value < 0 else 255 if value > 255 else int(value)
+
+
+class ColorPipeline:
+    """Slider values compiled into as few full-image passes as possible
+
+    Brightness and contrast are per-channel affine maps, and saturation and
+    hue are 3x3 matrices that keep grays gray, so all four collapse into a
+    single 3x4 color matrix applied by one convert() call. When the affine
+    part would clip (e.g. brightness 1.5), it runs as a lookup table first
+    to keep ImageEnhance's clipping behavior. Gamma is a lookup table and the
+    vignette darkens the result in place.
+    """
+
+    def __init__(self, brightness=1.0, contrast=1.0, saturation=1.0, hue=0.0, gamma=1.0, vignette=0.0):
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.hue = hue
+        self.gamma = gamma
+        self.vignette = vignette
+
+    @property
+    def is_identity(self):
+        return (self.brightness == 1.0 and self.contrast == 1.0 and self.saturation == 1.0
+                and self.hue == 0.0 and self.gamma == 1.0 and self.vignette == 0.0)
+
+    def _contrast_mean(self, image):
+        """Mean luma of the brightness-adjusted image, from the input histogram"""
+        hist = image.histogram()
+        pixels = image.width * image.height
+        mean = 0.0
+        for channel, weight in enumerate(LUMA):
+            counts = hist[channel * 256:(channel + 1) * 256]
+            mean += weight * sum(_blend8(v * self.brightness) * n for v, n in enumerate(counts))
+        return int(mean / pixels + 0.5)
+
+    def _color_matrix(self):
+        matrix = [[1.0 if i == j else 0.0 for j in range(3)] for i in range(3)]
+        if self.saturation != 1.0:
+            matrix = saturation_matrix(self.saturation)
+        if self.hue != 0.0:
+            matrix = _matmul(hue_matrix(self.hue), matrix)
+        return matrix
+
+    def _gamma_lut(self):
+        return [_clip8(255 * (v / 255) ** (1 / self.gamma)) for v in range(256)]
+
+    def _vignette_mask(self, size, rows=None):
+        """Radial darkening mask, built small and scaled to the image
+
+        rows=(top, bottom) returns just that horizontal band of the mask.
+        """
+        strength = self.vignette
+        mask = Image.radial_gradient("L").point(lambda v: int(255 * strength * (v / 255) ** 2))
+        if rows is None:
+            return mask.resize(size, Image.BILINEAR)
+        top, bottom = rows
+        scale = mask.height / size[1]
+        return mask.resize((size[0], bottom - top), Image.BILINEAR,
+                           box=(0, top * scale, mask.width, bottom * scale))
+
+    def _adjust(self, image, mean):
+        """Affine, matrix and gamma passes on an RGB image (no vignette)"""
+        # Per-channel affine part: v -> scale * v + offset
+        scale = self.brightness * self.contrast
+        offset = 0.0
+        if self.contrast != 1.0:
+            offset = (1 - self.contrast) * mean
+        clips = self.brightness > 1.0 or offset < 0 or offset + 255 * scale > 255
+        has_matrix = self.saturation != 1.0 or self.hue != 0.0
+        gamma_lut = self._gamma_lut() if self.gamma != 1.0 else None
+
+        if (clips or not has_matrix) and (scale != 1.0 or offset != 0.0 or gamma_lut):
+            lut = [_blend8(_blend8(v * self.brightness) * self.contrast + offset) for v in range(256)]
+            if gamma_lut and not has_matrix:
+                lut = [gamma_lut[v] for v in lut]
+                gamma_lut = None
+            image = image.point(lut * 3)
+            scale, offset = 1.0, 0.0
+        if has_matrix:
+            image = image.convert("RGB", tuple(
+                value for row in self._color_matrix() for value in [scale * m for m in row] + [offset - 0.5]
+            ))
+        if gamma_lut:
+            image = image.point(gamma_lut * 3)
+        return image
+
+    def apply(self, image):
+        """Return a new image with every adjustment applied"""
+        if self.is_identity:
+            return image
+        alpha = image.getchannel("A") if "A" in image.getbands() else None
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        source = image
+        image = self._adjust(image, self._contrast_mean(image) if self.contrast != 1.0 else None)
+        if self.vignette > 0:
+            if image is source:
+                image = image.copy()
+            image.paste((0, 0, 0), (0, 0), self._vignette_mask(image.size))
+        if alpha is not None:
+            image.putalpha(alpha)
+        return image
+
+    def apply_in_place(self, image, strip_height=STRIP_HEIGHT):
+        """Apply every adjustment to an RGB image band by band, modifying it
+
+        Only one band of intermediates is alive at a time, so print-size
+        posters never need a second full-size buffer.
+        """
+        if self.is_identity:
+            return image
+        if image.mode != "RGB":
+            raise ValueError(f"apply_in_place needs an RGB image, not {image.mode}")
+        mean = self._contrast_mean(image) if self.contrast != 1.0 else None
+        for top in range(0, image.height, strip_height):
+            bottom = min(image.height, top + strip_height)
+            box = (0, top, image.width, bottom)
+            band = self._adjust(image.crop(box), mean)
+            if self.vignette > 0:
+                band.paste((0, 0, 0), (0, 0), self._vignette_mask(image.size, (top, bottom)))
+            image.paste(band, box)
+        return image
+
+
+def adjust_colors(image, **adjustments):
+    """Apply color adjustments to image in a single fused pipeline"""
+    return ColorPipeline(**adjustments).apply(image)
@@ -0,0 +1,117 @@
+"""Lazy, memoized export encoding for downloads"""
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+from utils.atomic import atomic_open
+from utils.metrics import span
+
+MIME_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+# Named download variants: (format, max size, quality, file suffix)
+EXPORT_FORMATS = {
+    "png": ("PNG", None, None, ".png"),
+    "jpeg": ("JPEG", None, 95, ".jpg"),
+    "webp": ("WEBP", None, 90, ".webp"),
+    "web": ("PNG", (800, 800), None, "_web.png"),
+    "whatsapp": ("PNG", (400, 400), None, "_wa.png"),
+}
+
+
+def downscale(image, max_size):
+    """Fit image inside max_size using draft/reduce before the final resample"""
+    scale = min(1.0, max_size[0] / image.width, max_size[1] / image.height)
+    if scale >= 1.0:
+        return image
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if image.format == "JPEG":
+        # Not-yet-decoded JPEGs are decoded straight at a smaller scale
+        image.draft("RGB", target)
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(target, Image.LANCZOS)
+
+
+def _prepare(image, format, max_size, quality):
+    if max_size is not None:
+        image = downscale(image, max_size)
+    if format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    params = {}
+    if quality is not None:
+        params["quality"] = quality
+    return image, params
+
+
+def encode_variant(image, format="PNG", max_size=None, quality=None):
+    """Encode one export variant of image"""
+    image, params = _prepare(image, format, max_size, quality)
+    buf = BytesIO()
+    image.save(buf, format=format, **params)
+    return buf.getvalue()
+
+
+def write_variant(image, path, format="PNG", max_size=None, quality=None):
+    """Encode one export variant straight to a file (atomically replaced)"""
+    image, params = _prepare(image, format, max_size, quality)
+    with atomic_open(path) as f:
+        image.save(f, format=format, **params)
+    return os.path.getsize(path)
+
+
+class ExportCache:
+    """Process-wide LRU of encoded exports keyed by (digest, format, size, quality)
+
+    Nothing is encoded until a variant is requested, and each variant of a
+    design is encoded at most once while it stays in the cache.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def export(self, digest, load_image, format="PNG", max_size=None, quality=None):
+        """Return encoded bytes for a variant, calling load_image() only on a miss"""
+        key = (digest, format, max_size, quality)
+        data = self.get(key)
+        if data is None:
+            with span("export"):
+                data = encode_variant(load_image(), format, max_size, quality)
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
@@ -0,0 +1,94 @@
+"""Process-wide font registry and memoized text measurement"""
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "fonts")
+
+# Candidate files for each font kind, tried in order: bundled, system, by name
+FONT_CANDIDATES = {
+    "bold": [
+        os.path.join(BUNDLED_FONT_DIR, "DejaVuSans-Bold.ttf"),
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "DejaVuSans-Bold.ttf",
+        "Arial Bold.ttf",
+    ],
+    "regular": [
+        os.path.join(BUNDLED_FONT_DIR, "DejaVuSans.ttf"),
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "DejaVuSans.ttf",
+        "Arial.ttf",
+    ],
+}
+
+
+class FontRegistry:
+    """Bounded LRU of loaded TrueType fonts keyed by (path, size)"""
+
+    def __init__(self, max_fonts=64):
+        self.max_fonts = max_fonts
+        self._fonts = OrderedDict()
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, size):
+        """Return the font at path/size, loading it on first use (raises OSError)"""
+        key = (path, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                return font
+        font = ImageFont.truetype(path, size)
+        with self._lock:
+            self._fonts[key] = font
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+        return font
+
+    def load(self, kind, size):
+        """Return the first loadable font for kind, falling back to Pillow's default"""
+        path = self._resolved.get(kind)
+        if path is not None:
+            return self.get(path, size)
+        for candidate in FONT_CANDIDATES.get(kind, FONT_CANDIDATES["regular"]):
+            try:
+                font = self.get(candidate, size)
+            except OSError:
+                continue
+            self._resolved[kind] = candidate
+            return font
+        return _default_font(size)
+
+    def __len__(self):
+        return len(self._fonts)
+
+
+@lru_cache(maxsize=32)
+def _default_font(size):
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow < 10.1 has no scalable default font
+        return ImageFont.load_default()
+
+
+font_registry = FontRegistry()
+
+
+def get_font(kind, size):
+    """Shortcut for font_registry.load(kind, size)"""
+    return font_registry.load(kind, int(size))
+
+
+_measure_draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+@lru_cache(maxsize=4096)
+def text_bbox(text, font):
+    """Memoized equivalent of draw.textbbox((0, 0), text, font=font)"""
+    return _measure_draw.textbbox((0, 0), text, font=font)
@@ -0,0 +1,58 @@
+"""Compressed design images and thumbnails, as stored in the design library"""
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+
+THUMBNAIL_SIZE = (400, 400)
+# st.image passes JPEG and PNG bytes straight through but decodes and
+# re-encodes any other format (WebP included) every time it is shown
+THUMBNAIL_FORMAT = "JPEG"
+
+
+def write_image(image, fp, format="PNG"):
+    """Compress an image into a file object (fast PNG settings, lossless WebP)"""
+    if format == "PNG":
+        image.save(fp, format="PNG", compress_level=1)
+    elif format == "WEBP":
+        image.save(fp, format="WEBP", lossless=True, method=0)
+    else:
+        image.convert("RGB").save(fp, format=format, quality=90)
+
+
+def encode_image(image, format="PNG"):
+    """Compress an image to bytes, as write_image() does"""
+    buf = BytesIO()
+    write_image(image, buf, format)
+    return buf.getvalue()
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """Small preview bytes for gallery grids"""
+    scale = min(1.0, size[0] / image.width, size[1] / image.height)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    thumb = image.resize(target, Image.BICUBIC, reducing_gap=2.0)
+    if thumb.mode != "RGB":
+        thumb = thumb.convert("RGB")
+    buf = BytesIO()
+    thumb.save(buf, format=THUMBNAIL_FORMAT, quality=80)
+    return buf.getvalue()
+
+
+def encode_design(image, format="PNG"):
+    """Encode a finished design for saving: bytes, digest, thumbnail and size"""
+    data = encode_image(image, format)
+    return {
+        'digest': hashlib.sha256(data).hexdigest(),
+        'data': data,
+        'format': format,
+        'thumbnail': make_thumbnail(image),
+        'size': image.size,
+    }
+
+
+def decode_image(data):
+    """Decode encoded design bytes back into a full-resolution image"""
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
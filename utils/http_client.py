@@ -0,0 +1,92 @@
+"""Pooled, retrying HTTP client for the image generation backend"""
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ImageFetchError(Exception):
+    """Raised when an image could not be downloaded from the backend"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ImageHttpClient:
+    """Keep-alive HTTP client with jittered exponential backoff and a size cap
+
+    One instance is meant to be shared by the whole process so that every
+    session reuses the same connection pool.
+    """
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 connect_timeout=5.0, read_timeout=30.0, max_bytes=25 * 1024 * 1024,
+                 chunk_size=64 * 1024):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds to wait before the next attempt (full jitter)"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _read_body(self, response):
+        """Stream the response body in chunks, enforcing max_bytes"""
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise ImageFetchError(f"Image too large ({int(length)} bytes)")
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise ImageFetchError(f"Image larger than {self.max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def fetch(self, url):
+        """Download url and return the body bytes, retrying on 429/5xx and network errors"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    if response.status_code == 200:
+                        return self._read_body(response)
+                    if response.status_code not in RETRY_STATUSES:
+                        raise ImageFetchError(
+                            f"Failed to generate image (HTTP {response.status_code})",
+                            status_code=response.status_code,
+                        )
+                    retry_after = response.headers.get("Retry-After")
+                    last_error = ImageFetchError(
+                        f"Image service busy (HTTP {response.status_code})",
+                        status_code=response.status_code,
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = ImageFetchError(f"Image service unreachable: {e.__class__.__name__}")
+            if attempt < self.max_retries:
+                metrics.inc("meme_backend_retries_total")
+                time.sleep(self._backoff(attempt, retry_after))
+        raise last_error
+
+    def close(self):
+        self.session.close()
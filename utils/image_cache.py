@@ -0,0 +1,147 @@
+"""Persistent, content-addressed cache for generated base images"""
+import hashlib
+import json
+import os
+import threading
+
+from utils.atomic import write_atomic
+from utils.prompts import normalize_prompt
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/ai_meme_creator/images")
+
+
+def make_cache_key(full_prompt, width, height, style="", seed=None):
+    """Build a stable cache key from the normalized request parameters"""
+    payload = json.dumps(
+        [normalize_prompt(full_prompt), int(width), int(height), " ".join(style.split()).casefold(), seed],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """On-disk LRU cache of raw image bytes, safe to share between sessions
+
+    Entries are written atomically (temp file + rename) so concurrent
+    Streamlit sessions never see a half-written image. Recency is tracked
+    through file modification times, which keeps the LRU order shared by
+    every process using the same directory.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.img")
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cached entry"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".img"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing, or evicted by another session between lookup and read
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def contains(self, key):
+        """True if key is cached, without counting a hit or touching its recency"""
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        """Store bytes under key, evicting least recently used entries if needed"""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        write_atomic(path, data)
+        with self._lock:
+            self.writes += 1
+            self._total_bytes += len(data) - replaced
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def delete(self, key):
+        """Drop one entry (e.g. bytes that turned out not to decode)"""
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._total_bytes = total
+            self.evictions += evicted
+
+    def clear(self):
+        """Remove every cached entry"""
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._total_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current disk usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,299 @@
+"""Persistent design library: SQLite metadata index plus a content-addressed blob store"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from utils import metrics
+from utils.atomic import FILE_MODE, write_atomic
+from utils.history import make_thumbnail, write_image
+
+DEFAULT_LIBRARY_DIR = os.path.expanduser("~/.local/share/ai_meme_creator/library")
+
+logger = logging.getLogger("ai_meme_creator.library")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS designs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    format TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    prompt TEXT NOT NULL DEFAULT '',
+    style TEXT,
+    preset TEXT,
+    template TEXT,
+    texts TEXT NOT NULL DEFAULT '{}',
+    created REAL NOT NULL,
+    UNIQUE (owner, digest)
+);
+CREATE INDEX IF NOT EXISTS designs_owner_created ON designs (owner, created DESC);
+CREATE INDEX IF NOT EXISTS designs_digest ON designs (digest);
+"""
+
+# External-content FTS index over prompt and template name, kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS designs_fts USING fts5(
+    prompt, template, content='designs', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS designs_fts_insert AFTER INSERT ON designs BEGIN
+    INSERT INTO designs_fts (rowid, prompt, template)
+    VALUES (new.id, new.prompt, coalesce(new.template, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS designs_fts_delete AFTER DELETE ON designs BEGIN
+    INSERT INTO designs_fts (designs_fts, rowid, prompt, template)
+    VALUES ('delete', old.id, old.prompt, coalesce(old.template, ''));
+END;
+"""
+
+_COLUMNS = "d.id, d.digest, d.format, d.width, d.height, d.prompt, d.style, d.preset, d.template, d.texts, d.created"
+
+MIME_TYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+
+def _match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = [word.replace('"', '""') for word in query.split()]
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class DesignLibrary:
+    """Saved designs that outlive the session, shared by every process on the host
+
+    Metadata (prompt, style, preset, template, texts, timestamp, digest)
+    lives in one SQLite file in WAL mode, so gallery pages and searches are
+    index lookups that never touch image bytes. Images and their thumbnails
+    are stored once per content digest under blobs/<ab>/, written atomically
+    like the image cache, and removed when the last design using them is
+    deleted. Designs are grouped by an opaque owner token.
+    """
+
+    def __init__(self, root=DEFAULT_LIBRARY_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "library.db"), timeout=10, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        # Serializes saves and deletes so blob garbage collection never races a save
+        self._write_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-save")
+        with self._db_lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            try:
+                self._db.executescript(_FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to LIKE scans
+                self.full_text = False
+
+    def _path(self, digest, suffix):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}{suffix}")
+
+    def _write_blob(self, path, data):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+
+    def _query(self, sql, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -- saving -----------------------------------------------------------------
+
+    def save(self, owner, data, thumbnail, digest, format="PNG", size=(0, 0), prompt="",
+             style=None, preset=None, template=None, texts=None):
+        """Store encoded design bytes and index them, returning the design id
+
+        Saving the same image again for the same owner only moves it back to
+        the top of the gallery.
+        """
+        with metrics.span("library_save"), self._write_lock:
+            self._write_blob(self._path(digest, ".img"), data)
+            self._write_blob(self._path(digest, ".thumb"), thumbnail)
+            design_id = self._index(owner, digest, format, size, prompt, style, preset, template, texts)
+        metrics.inc("meme_library_saves_total")
+        return design_id
+
+    def save_image(self, owner, image, format="PNG", prompt="", style=None, preset=None, template=None,
+                   texts=None):
+        """Encode a PIL image straight into the blob store and index it, returning the design id
+
+        The image is compressed into a temp file beside the blobs and hashed
+        from there, so its encoded bytes are never held in memory; large
+        posters need little more than the decoded image itself.
+        """
+        with metrics.span("encode_design"):
+            digest, tmp_path = self._encode_blob(image, format)
+            thumbnail = make_thumbnail(image)
+        try:
+            with metrics.span("library_save"), self._write_lock:
+                path = self._path(digest, ".img")
+                if os.path.exists(path):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                self._write_blob(self._path(digest, ".thumb"), thumbnail)
+                design_id = self._index(owner, digest, format, image.size, prompt, style, preset, template, texts)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        metrics.inc("meme_library_saves_total")
+        return design_id
+
+    def _encode_blob(self, image, format):
+        """Encode image into a temp file in the blob store, returning (digest, temp path)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w+b") as f:
+                write_image(image, f, format)
+                f.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            os.chmod(tmp_path, FILE_MODE)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return digest.hexdigest(), tmp_path
+
+    def _index(self, owner, digest, format, size, prompt, style, preset, template, texts):
+        with self._db_lock, self._db:
+            row = self._db.execute(
+                "INSERT INTO designs (owner, digest, format, width, height, prompt, style, preset, template, texts, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner, digest) DO UPDATE SET created = excluded.created "
+                "RETURNING id",
+                (owner, digest, format, size[0], size[1], prompt, style, preset, template,
+                 json.dumps(texts or {}), time.time()),
+            ).fetchone()
+        return row["id"]
+
+    def save_async(self, owner, *args, **kwargs):
+        """Queue save() on the library's writer thread and return its Future"""
+        future = self._writer.submit(self.save, owner, *args, **kwargs)
+        future.add_done_callback(_log_failure)
+        return future
+
+    # -- browsing ---------------------------------------------------------------
+
+    def _where(self, owner, query):
+        query = (query or "").strip()
+        if not query:
+            return "FROM designs d WHERE d.owner = ?", (owner,)
+        if self.full_text:
+            return (
+                "FROM designs d JOIN designs_fts f ON f.rowid = d.id "
+                "WHERE designs_fts MATCH ? AND d.owner = ?",
+                (_match_expression(query), owner),
+            )
+        pattern = f"%{query}%"
+        return (
+            "FROM designs d WHERE d.owner = ? AND (d.prompt LIKE ? OR d.template LIKE ?)",
+            (owner, pattern, pattern),
+        )
+
+    def count(self, owner, query=None):
+        """Number of designs for owner, optionally matching a search"""
+        where, params = self._where(owner, query)
+        return self._query(f"SELECT count(*) {where}", params)[0][0]
+
+    def page(self, owner, page=0, page_size=9, query=None):
+        """Metadata for one gallery page, newest first (no image bytes are read)"""
+        where, params = self._where(owner, query)
+        rows = self._query(
+            f"SELECT {_COLUMNS} {where} ORDER BY d.created DESC, d.id DESC LIMIT ? OFFSET ?",
+            params + (page_size, page * page_size),
+        )
+        return [self._entry(row) for row in rows]
+
+    def _entry(self, row):
+        entry = dict(row)
+        entry["texts"] = json.loads(entry["texts"])
+        entry["mime"] = MIME_TYPES.get(entry["format"], "application/octet-stream")
+        return entry
+
+    def entries(self, owner, ids):
+        """Metadata for specific designs, newest first"""
+        ids = list(ids)
+        if not ids:
+            return []
+        marks = ", ".join("?" * len(ids))
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM designs d WHERE d.owner = ? AND d.id IN ({marks}) ORDER BY d.created DESC",
+            (owner, *ids),
+        )
+        return [self._entry(row) for row in rows]
+
+    def thumbnail(self, entry):
+        """Precomputed thumbnail bytes for a page entry"""
+        with open(self._path(entry["digest"], ".thumb"), "rb") as f:
+            return f.read()
+
+    def read(self, entry):
+        """Full-resolution encoded bytes for a page entry"""
+        with open(self._path(entry["digest"], ".img"), "rb") as f:
+            return f.read()
+
+    def load_image(self, entry):
+        """Decode the full-resolution image for a page entry"""
+        image = Image.open(self._path(entry["digest"], ".img"))
+        image.load()
+        return image
+
+    # -- deleting ---------------------------------------------------------------
+
+    def delete(self, owner, design_id):
+        """Remove one design, and its blobs if no other design uses them"""
+        with self._write_lock:
+            with self._db_lock, self._db:
+                rows = self._db.execute(
+                    "DELETE FROM designs WHERE owner = ? AND id = ? RETURNING digest", (owner, design_id)
+                ).fetchall()
+            self._collect([row["digest"] for row in rows])
+
+    def clear(self, owner):
+        """Remove every design belonging to owner"""
+        with self._write_lock:
+            with self._db_lock, self._db:
+                rows = self._db.execute("DELETE FROM designs WHERE owner = ? RETURNING digest", (owner,)).fetchall()
+            self._collect([row["digest"] for row in rows])
+
+    def _collect(self, digests):
+        for digest in set(digests):
+            if self._query("SELECT 1 FROM designs WHERE digest = ? LIMIT 1", (digest,)):
+                continue
+            for suffix in (".img", ".thumb"):
+                try:
+                    os.remove(self._path(digest, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        row = self._query("SELECT count(*), count(DISTINCT owner), count(DISTINCT digest) FROM designs")[0]
+        return {"designs": row[0], "owners": row[1], "blobs": row[2], "full_text": self.full_text}
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        with self._db_lock:
+            self._db.close()
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        metrics.inc("meme_library_save_errors_total")
+        logger.warning("Saving a design to the library failed: %s", error)
@@ -0,0 +1,216 @@
+"""Lightweight per-stage tracing and process-wide metrics
+
+Stages are timed with span("name"). Each span feeds a latency histogram
+and, when a render trace is active, that render's timing breakdown.
+Counters track cache hits, backend errors, bytes fetched and so on. The
+whole layer can be exported as Prometheus text or logged as JSON, and
+setting MEME_METRICS=0 turns every call into a no-op.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from utils.atomic import atomic_open
+
+ENABLED = os.environ.get("MEME_METRICS", "1") != "0"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+logger = logging.getLogger("ai_meme_creator.metrics")
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a reservoir for percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, reservoir=1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=reservoir)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q):
+        """Percentile (0-100) over the most recent observations"""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """Counters plus count/mean/p50/p95/p99 for every histogram"""
+        with self._lock:
+            counters = {_series(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {
+                _series(name, labels): {
+                    "count": h.count,
+                    "mean": h.sum / h.count if h.count else None,
+                    "p50": h.percentile(50),
+                    "p95": h.percentile(95),
+                    "p99": h.percentile(99),
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (series_name, labels), value in sorted(self._counters.items()):
+                    if series_name == name:
+                        lines.append(f"{_series(name, labels)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (series_name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f"{_series(name + '_bucket', labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{_series(name + '_sum', labels)} {h.sum}")
+                    lines.append(f"{_series(name + '_count', labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path):
+        """Atomically write the metrics for a node_exporter textfile collector"""
+        with atomic_open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+
+registry = MetricsRegistry()
+_current_trace = ContextVar("render_trace", default=None)
+
+
+class RenderTrace:
+    """Timing breakdown of a single render"""
+
+    def __init__(self, **attributes):
+        self.attributes = attributes
+        self.stages = []
+        self.started = time.perf_counter()
+        self.total = None
+        self.token = None
+
+    def add(self, name, seconds):
+        self.stages.append((name, seconds))
+
+    def as_dict(self):
+        return {
+            **self.attributes,
+            "total_ms": round((self.total or 0) * 1000, 1),
+            "stages": [{"stage": name, "ms": round(seconds * 1000, 1)} for name, seconds in self.stages],
+        }
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        registry.observe("meme_stage_seconds", elapsed, stage=self.name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, elapsed)
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def span(name):
+    """Time a stage: `with span("fetch"): ...`"""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def inc(name, value=1, **labels):
+    if ENABLED:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        registry.observe(name, value, **labels)
+
+
+def start_trace(**attributes):
+    """Begin collecting a per-render breakdown in the current context"""
+    if not ENABLED:
+        return None
+    trace = RenderTrace(**attributes)
+    trace.token = _current_trace.set(trace)
+    return trace
+
+
+def end_trace(trace, ok=True):
+    """Finish a render trace, record its total and log it as JSON"""
+    if trace is None:
+        return None
+    trace.total = time.perf_counter() - trace.started
+    _current_trace.reset(trace.token)
+    registry.observe("meme_render_seconds", trace.total)
+    registry.inc("meme_renders_total", status="ok" if ok else "error")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": "render", "ok": ok, **trace.as_dict()}))
+    return trace
@@ -0,0 +1,90 @@
+"""Script-run profiling: how long each Streamlit rerun takes, and where
+
+Every interaction re-executes the app script, or a single fragment of it.
+start_rerun() opens a profile for that run, section("sidebar") times
+parts of it, and end_rerun() records the total in the meme_rerun_seconds
+histogram, labelled by scope ("app" or "fragment:<name>") and kind
+("interaction", or "render" when the run generated a design). Runs that
+are not renders are held to a latency budget: one that overruns it is
+counted and logged as JSON with its section breakdown.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils import metrics
+
+logger = logging.getLogger("ai_meme_creator.profiler")
+
+_current_rerun = ContextVar("rerun_profile", default=None)
+
+
+class RerunProfile:
+    """Timing breakdown of a single script or fragment run"""
+
+    def __init__(self, scope, **attributes):
+        self.scope = scope
+        self.attributes = attributes
+        self.sections = []
+        self.started = time.perf_counter()
+        self.total = None
+        self.over_budget = False
+
+    @property
+    def kind(self):
+        return "render" if self.attributes.get("render") else "interaction"
+
+    @contextmanager
+    def section(self, name):
+        """Time part of the run: `with profile.section("sidebar"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.sections.append((name, time.perf_counter() - start))
+
+    def annotate(self, **attributes):
+        self.attributes.update(attributes)
+
+    def as_dict(self):
+        return {
+            "scope": self.scope,
+            "kind": self.kind,
+            **self.attributes,
+            "total_ms": round((self.total or 0) * 1000, 1),
+            "over_budget": self.over_budget,
+            "sections": [{"section": name, "ms": round(seconds * 1000, 1)} for name, seconds in self.sections],
+        }
+
+
+def start_rerun(scope, **attributes):
+    """Begin profiling a run and make it the current one"""
+    profile = RerunProfile(scope, **attributes)
+    _current_rerun.set(profile)
+    return profile
+
+
+def current_rerun():
+    """The run being profiled on this thread, if any"""
+    return _current_rerun.get()
+
+
+def end_rerun(profile, budget=None):
+    """Finish a run, record it and check it against budget (seconds)"""
+    profile.total = time.perf_counter() - profile.started
+    if _current_rerun.get() is profile:
+        _current_rerun.set(None)
+    profile.over_budget = budget is not None and profile.kind == "interaction" and profile.total > budget
+    if metrics.ENABLED:
+        metrics.registry.observe("meme_rerun_seconds", profile.total, scope=profile.scope, kind=profile.kind)
+        for name, seconds in profile.sections:
+            metrics.registry.observe("meme_rerun_section_seconds", seconds, section=name)
+    if profile.over_budget:
+        metrics.inc("meme_rerun_over_budget_total", scope=profile.scope)
+        logger.warning(json.dumps({"event": "rerun_over_budget", "budget_ms": round(budget * 1000),
+                                   **profile.as_dict()}))
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"event": "rerun", **profile.as_dict()}))
+    return profile
@@ -0,0 +1,63 @@
+"""Prompt building helpers shared by the app and the image cache"""
+import re
+
+# Style descriptions appended to every Pollinations prompt
+STYLE_MAP = {
+    "Modern Minimal": "minimalist modern design clean aesthetic",
+    "Bold & Colorful": "vibrant bold colors energetic eye-catching",
+    "Professional": "professional clean corporate elegant",
+    "Vintage Retro": "vintage retro nostalgic 80s style",
+    "Cyberpunk": "cyberpunk neon futuristic sci-fi",
+    "Anime": "anime manga japanese animation style",
+    "Cartoon": "cartoon illustrated playful fun",
+    "3D Render": "3d rendered glossy modern cgi",
+    "Realistic Photo": "photorealistic detailed professional photography"
+}
+
+# Visual styles in the order the sidebar offers them
+STYLE_NAMES = tuple(STYLE_MAP)
+
+# What the user is creating (sidebar purpose selector)
+PURPOSES = ("College Event Poster", "Social Media Post", "Meme", "Announcement", "Workshop/Seminar",
+            "Club Activity", "Motivational Poster", "Custom")
+
+# Quick prompt enhancers, in the order the Create tab applies them
+PROMPT_ENHANCERS = {
+    "energy": "high energy vibrant dynamic",
+    "professional": "professional clean elegant",
+    "fun": "fun playful cheerful",
+}
+
+
+def enhance_prompt(prompt, energy=False, professional=False, fun=False):
+    """Append the selected quick enhancers to a prompt"""
+    enhanced_prompt = prompt
+    if energy:
+        enhanced_prompt += f", {PROMPT_ENHANCERS['energy']}"
+    if professional:
+        enhanced_prompt += f", {PROMPT_ENHANCERS['professional']}"
+    if fun:
+        enhanced_prompt += f", {PROMPT_ENHANCERS['fun']}"
+    return enhanced_prompt
+
+
+def build_full_prompt(prompt, style=""):
+    """Combine a prompt with its style description"""
+    return f"{prompt}, {STYLE_MAP.get(style, '')}"
+
+
+def normalize_prompt(prompt):
+    """Fold case and whitespace and put enhancer suffixes in canonical order"""
+    parts = []
+    enhancers = set()
+    canonical = [" ".join(suffix.split()) for suffix in PROMPT_ENHANCERS.values()]
+    for part in prompt.split(","):
+        part = re.sub(r"\s+", " ", part).strip().casefold()
+        if not part:
+            continue
+        if part in canonical:
+            enhancers.add(part)
+        else:
+            parts.append(part)
+    parts.extend(suffix for suffix in canonical if suffix in enhancers)
+    return ", ".join(parts)
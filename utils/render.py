@@ -0,0 +1,223 @@
+"""Streamlit-free rendering core shared by the app and the batch CLI"""
+from io import BytesIO
+
+from PIL import Image, UnidentifiedImageError
+
+from utils import metrics
+from utils.backends import PollinationsBackend
+from utils.color import ColorPipeline
+from utils.fonts import get_font
+from utils.image_cache import make_cache_key
+from utils.metrics import span
+from utils.prompts import build_full_prompt
+from utils.text_render import build_text_overlay, render_text
+
+
+def request_key(prompt, width, height, style="", seed=None):
+    """Key identifying a base image request, with the prompt normalized"""
+    return make_cache_key(build_full_prompt(prompt, style), width, height, style, seed)
+
+
+def fetch_image_bytes(prompt, width, height, style="", seed=None, cache=None, client=None, backend=None):
+    """Return the raw bytes of a generated base image, using the cache when possible
+
+    backend defaults to Pollinations through client; backends that are not
+    cacheable bypass the cache.
+    """
+    backend = backend or PollinationsBackend(client)
+    if not backend.cacheable:
+        cache = None
+    cache_key = make_cache_key(build_full_prompt(prompt, style), width, height, style, seed)
+    if cache is not None:
+        with span("cache_lookup"):
+            cached = cache.get(cache_key)
+        if cached is not None:
+            metrics.inc("meme_image_cache_total", result="hit")
+            return cached
+        metrics.inc("meme_image_cache_total", result="miss")
+
+    try:
+        with span("fetch"):
+            data = backend.fetch(prompt, width, height, style, seed)
+    except Exception as e:
+        metrics.inc("meme_backend_errors_total", backend=backend.name, error=type(e).__name__)
+        raise
+    metrics.inc("meme_bytes_fetched_total", len(data))
+    if cache is not None:
+        # An error page or truncated body must not become a permanent cache hit
+        try:
+            Image.open(BytesIO(data)).verify()
+        except Exception as e:
+            metrics.inc("meme_backend_errors_total", backend=backend.name, error="UnidentifiedImageError")
+            raise UnidentifiedImageError(f"The image service sent back something that is not an image ({e})") from e
+        cache.put(cache_key, data)
+    return data
+
+
+def decode_base_image(data, cache=None, key=None):
+    """Decode base image bytes, dropping their cache entry if they turn out unreadable"""
+    try:
+        with span("decode"):
+            image = Image.open(BytesIO(data))
+            image.load()
+    except Exception:
+        if cache is not None and key is not None:
+            cache.delete(key)
+        raise
+    return image
+
+
+def fetch_base_image(prompt, width, height, style="", seed=None, cache=None, client=None, flights=None,
+                     backend=None):
+    """Fetch a generated base image and decode it
+
+    With a SingleFlight, concurrent identical requests share one fetch and
+    one decoded image, which callers must not modify in place. Backends
+    that are not cacheable (local ones) render directly.
+    """
+    if backend is not None and not backend.cacheable:
+        return backend.generate(prompt, width, height, style, seed)
+    if flights is not None:
+        return flights.do(request_key(prompt, width, height, style, seed),
+                          lambda: fetch_base_image(prompt, width, height, style, seed, cache, client, backend=backend))
+    data = fetch_image_bytes(prompt, width, height, style, seed, cache, client, backend)
+    return decode_base_image(data, cache, request_key(prompt, width, height, style, seed))
+
+
+def add_text_to_image(image, texts, position, text_color, outline_color, outline_width=3, shadow=False, scale=1.0):
+    """Add multiple text layers to image"""
+    return render_text(image, texts, position, text_color, outline_color, outline_width=outline_width, shadow=shadow, scale=scale)
+
+
+def build_text_layers(text_position, main_text="", subtext="", bottom_text="", contact_info="", text_size=50, scale=1.0):
+    """Pick the (text, font) lines to draw for a text position"""
+    if text_position == "None":
+        return []
+    font = get_font("bold", max(8, text_size * scale))
+    small_font = get_font("regular", max(8, text_size * 0.6 * scale))
+
+    texts_to_add = []
+    if text_position in ["Top", "Top & Bottom"] and main_text:
+        texts_to_add.append((main_text, font))
+    if subtext:
+        texts_to_add.append((subtext, small_font))
+    if text_position in ["Bottom", "Top & Bottom"] and bottom_text:
+        texts_to_add.append((bottom_text, small_font))
+    if contact_info:
+        texts_to_add.append((contact_info, small_font))
+    return texts_to_add
+
+
+_MISSING = object()
+
+
+def image_nbytes(image):
+    """Approximate memory held by a decoded image (Pillow keeps RGB as 4 bytes per pixel)"""
+    return image.width * image.height * (1 if image.mode in ("1", "L", "P") else 4)
+
+
+class DesignLayers:
+    """A design as cached layers: base image, color-adjusted image and text overlay
+
+    Each layer is memoized on its own inputs, so an edit only recomputes
+    the layers whose inputs changed (text edits reuse the adjusted image,
+    effect edits reuse the overlay) before a single composite.
+
+    With memory_bounded=True (large formats) the adjusted layer is not
+    kept: each compose makes one working copy of the base, adjusts it band
+    by band and draws the text onto it in place.
+    """
+
+    def __init__(self, base, memory_bounded=False):
+        self.base = base
+        self.memory_bounded = memory_bounded and base.mode == "RGB"
+        self._adjusted_key = self._overlay_key = _MISSING
+        self._adjusted = self._overlay = None
+        self.recomputed = []
+
+    def adjusted(self, effects=None):
+        """The base image with ColorPipeline effects applied (None for none)"""
+        key = tuple(sorted(effects.items())) if effects else None
+        if key != self._adjusted_key:
+            image = self.base
+            if effects:
+                with span("effects"):
+                    image = ColorPipeline(**effects).apply(self.base)
+            self._adjusted_key, self._adjusted = key, image
+            self.recomputed.append("adjusted")
+        return self._adjusted
+
+    def overlay(self, main_text="", subtext="", bottom_text="", contact_info="", text_position="Top",
+                text_size=50, text_color="#FFFFFF", outline_color="#000000", outline_width=3,
+                text_shadow=False, scale=1.0):
+        """The transparent text layer, or None when there is no text to draw"""
+        key = (main_text, subtext, bottom_text, contact_info, text_position, text_size, text_color,
+               outline_color, outline_width, text_shadow, scale)
+        if key != self._overlay_key:
+            with span("text"):
+                texts_to_add = build_text_layers(text_position, main_text, subtext, bottom_text, contact_info,
+                                                 text_size, scale)
+                overlay = None
+                if texts_to_add:
+                    overlay = build_text_overlay(self.base.size, texts_to_add, text_position, text_color,
+                                                 outline_color, outline_width=outline_width,
+                                                 shadow=text_shadow, scale=scale)
+            self._overlay_key, self._overlay = key, overlay
+            self.recomputed.append("overlay")
+        return self._overlay
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the cached layers"""
+        total = image_nbytes(self.base)
+        if self._adjusted is not None and self._adjusted is not self.base:
+            total += image_nbytes(self._adjusted)
+        if self._overlay is not None:
+            total += sum(image_nbytes(tile) for _, tile in self._overlay.tiles)
+        return total
+
+    def compose(self, effects=None, **text):
+        """Composite the text overlay onto the adjusted image (a new image)"""
+        self.recomputed = []
+        if self.memory_bounded:
+            self.recomputed.append("adjusted")
+            return compose_in_place(self.base.copy(), effects, self.overlay(**text))
+        adjusted = self.adjusted(effects)
+        overlay = self.overlay(**text)
+        if overlay is None:
+            return adjusted
+        with span("composite"):
+            return overlay.apply(adjusted)
+
+
+def compose_in_place(image, effects=None, overlay=None):
+    """Adjust an RGB image band by band and draw overlay onto it, modifying it"""
+    if effects:
+        with span("effects"):
+            ColorPipeline(**effects).apply_in_place(image)
+    if overlay is not None:
+        with span("composite"):
+            overlay.apply(image, in_place=True)
+    return image
+
+
+def compose_design(image, main_text="", subtext="", bottom_text="", contact_info="", text_position="Top",
+                   text_size=50, text_color="#FFFFFF", outline_color="#000000", outline_width=3,
+                   text_shadow=False, effects=None, scale=1.0, in_place=False):
+    """Apply color effects and text overlays to a base image
+
+    effects is a dict of ColorPipeline arguments, or None to skip the stage.
+    scale shrinks every text dimension for reduced-size previews.
+    in_place=True modifies an RGB image directly instead of copying it,
+    the memory-bounded path for large formats.
+    """
+    if in_place and image.mode == "RGB":
+        layers = DesignLayers(image)
+        overlay = layers.overlay(main_text, subtext, bottom_text, contact_info, text_position, text_size,
+                                 text_color, outline_color, outline_width, text_shadow, scale)
+        return compose_in_place(image, effects, overlay)
+    return DesignLayers(image).compose(
+        effects, main_text=main_text, subtext=subtext, bottom_text=bottom_text, contact_info=contact_info,
+        text_position=text_position, text_size=text_size, text_color=text_color, outline_color=outline_color,
+        outline_width=outline_width, text_shadow=text_shadow, scale=scale,
+    )
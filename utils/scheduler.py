@@ -0,0 +1,243 @@
+"""Process-wide fair-share scheduler for upstream image generation"""
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from utils import metrics
+
+
+class SchedulerBusy(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueCancelled(BaseException):
+    """Raised in a request that was withdrawn while it waited for a slot
+
+    Like a cancelled task it is a BaseException, so request coalescing
+    treats the request as abandoned rather than failed.
+    """
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        """Take a token and return 0, or return the seconds until one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Ticket:
+    __slots__ = ("session_id", "granted", "enqueued")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class GenerationScheduler:
+    """Rate-limited, concurrency-capped, round-robin queue of upstream calls
+
+    Each session has its own FIFO and sessions take turns, so one user
+    firing many requests cannot push everyone else back. Requests are shed
+    with SchedulerBusy when the whole queue or a session's share of it is
+    full, or when a request waits longer than queue_timeout. A request
+    whose caller stops waiting (its cancel event is set) leaves the queue.
+    """
+
+    def __init__(self, max_concurrency=4, rate=2.0, burst=4, max_queue=32, max_per_session=4,
+                 queue_timeout=90.0, expected_seconds=8.0, poll_interval=0.5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.bucket = TokenBucket(rate, burst)
+        self.avg_seconds = expected_seconds
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._next_token_in = 0.0
+        self.completed = 0
+        self.shed = 0
+
+    # -- queue bookkeeping (call with the condition held) ---------------------
+
+    def _dispatch(self):
+        """Grant slots in round-robin order while concurrency and tokens allow"""
+        self._next_token_in = 0.0
+        while self._queues and self._running < self.max_concurrency:
+            delay = self.bucket.try_take()
+            if delay:
+                self._next_token_in = delay
+                return
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            self._queued -= 1
+            self._running += 1
+            ticket.granted = True
+            self._cond.notify_all()
+
+    def _remove(self, ticket):
+        queue = self._queues.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self._queued -= 1
+        if not queue:
+            del self._queues[ticket.session_id]
+
+    def _position(self, ticket):
+        """Number of requests that will be served before ticket"""
+        queue = self._queues.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return 0
+        # Sessions take one turn each per round, in queue order
+        turn = queue.index(ticket)
+        ahead = turn
+        earlier = True
+        for session_id, other in self._queues.items():
+            if session_id == ticket.session_id:
+                earlier = False
+                continue
+            ahead += min(len(other), turn) + (1 if earlier and len(other) > turn else 0)
+        return ahead
+
+    def _eta(self, ahead):
+        busy_rounds = (ahead + self._running) // self.max_concurrency
+        by_concurrency = busy_rounds * self.avg_seconds
+        by_rate = max(0.0, (ahead + 1 - self.bucket.tokens) / self.bucket.rate)
+        return max(by_concurrency, by_rate, self._next_token_in)
+
+    # -- public API -----------------------------------------------------------
+
+    @contextmanager
+    def slot(self, session_id, on_wait=None, cancel=None):
+        """Wait for a fair turn, then hold one upstream slot for the block
+
+        on_wait(position, eta_seconds) is called from the waiting thread
+        while the request is queued, so callers can show progress. Setting
+        the cancel event (a threading.Event) withdraws a request that is
+        still queued with QueueCancelled; one already granted runs on.
+        """
+        ticket = _Ticket(session_id)
+        with self._cond:
+            if self._queued >= self.max_queue:
+                self._shed("queue_full")
+                raise SchedulerBusy(
+                    f"The image service is very busy right now ({self._queued} requests waiting). "
+                    "Please try again in a minute.",
+                    retry_after=self._eta(self._queued),
+                )
+            if len(self._queues.get(session_id, ())) >= self.max_per_session:
+                self._shed("session_limit")
+                raise SchedulerBusy(
+                    f"You already have {self.max_per_session} images waiting. "
+                    "Please wait for them to finish before asking for more."
+                )
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+
+        started = time.monotonic()
+        try:
+            while True:
+                with self._cond:
+                    self._dispatch()
+                    if ticket.granted:
+                        break
+                    if cancel is not None and cancel.is_set():
+                        metrics.inc("meme_scheduler_cancelled_total")
+                        raise QueueCancelled()
+                    waited = time.monotonic() - started
+                    if waited >= self.queue_timeout:
+                        self._remove(ticket)
+                        self._shed("timeout")
+                        raise SchedulerBusy(
+                            f"Gave up after waiting {waited:.0f}s in the queue. Please try again shortly."
+                        )
+                    position = self._position(ticket) + 1
+                    eta = self._eta(position - 1)
+                    self._cond.wait(min(self.poll_interval, self._next_token_in or self.poll_interval))
+                if on_wait is not None:
+                    on_wait(position, eta)
+        except BaseException:
+            with self._cond:
+                if ticket.granted:
+                    self._release()
+                else:
+                    self._remove(ticket)
+            raise
+
+        metrics.observe("meme_queue_wait_seconds", time.monotonic() - ticket.enqueued)
+        run_start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.monotonic() - run_start)
+                self.completed += 1
+                self._release()
+
+    def run(self, session_id, fn, on_wait=None, cancel=None):
+        """Call fn() inside a scheduled slot and return its result"""
+        with self.slot(session_id, on_wait, cancel):
+            return fn()
+
+    def _release(self):
+        self._running -= 1
+        self._dispatch()
+        self._cond.notify_all()
+
+    def _shed(self, reason):
+        self.shed += 1
+        metrics.inc("meme_scheduler_shed_total", reason=reason)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "sessions_waiting": len(self._queues),
+                "completed": self.completed,
+                "shed": self.shed,
+                "avg_seconds": round(self.avg_seconds, 2),
+            }
+
+
+class ScheduledClient:
+    """Wrap an ImageHttpClient so every fetch goes through a scheduler slot"""
+
+    def __init__(self, client, scheduler, session_id, on_wait=None, cancel=None):
+        self.client = client
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self.on_wait = on_wait
+        self.cancel = cancel
+
+    def fetch(self, url):
+        return self.scheduler.run(self.session_id, lambda: self.client.fetch(url), self.on_wait, self.cancel)
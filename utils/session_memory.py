@@ -0,0 +1,86 @@
+"""Process-wide, byte-budgeted home for the large objects sessions keep between reruns"""
+import threading
+from collections import OrderedDict
+
+from utils import metrics
+
+
+class SessionMemory:
+    """Values sessions keep between reruns, within a per-session and a global byte budget
+
+    Each value is stored under (session_id, name) with its size in bytes,
+    instead of in st.session_state where it would live as long as the
+    session. Putting a value evicts the session's least recently used
+    values while the session is over its budget, then the least recently
+    used values of any session while the total is over the global budget;
+    the value just put is never the one evicted. get() returns None once a
+    value is gone, so callers keep enough to rebuild it. Sessions that end
+    simply age out.
+    """
+
+    def __init__(self, session_max_bytes, max_bytes):
+        self.session_max_bytes = session_max_bytes
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._entries = OrderedDict()
+        self._sessions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, session_id, name, value, nbytes):
+        """Store value (about nbytes in memory), replacing any earlier one under the same name"""
+        key = (session_id, name)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, nbytes)
+            self._sessions[session_id] = self._sessions.get(session_id, 0) + nbytes
+            self._bytes += nbytes
+            for other in [k for k in self._entries if k[0] == session_id and k != key]:
+                if self._sessions[session_id] <= self.session_max_bytes:
+                    break
+                self._evict(other)
+            for other in [k for k in self._entries if k != key]:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._evict(other)
+
+    def get(self, session_id, name):
+        """The stored value, or None if it was never stored or has been evicted"""
+        key = (session_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def discard(self, session_id, name):
+        with self._lock:
+            self._remove((session_id, name))
+
+    def usage(self, session_id=None):
+        """Bytes held for one session, or for all of them"""
+        with self._lock:
+            if session_id is None:
+                return self._bytes
+            return self._sessions.get(session_id, 0)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "sessions": len(self._sessions), "bytes": self._bytes,
+                    "evicted": self.evicted}
+
+    def _evict(self, key):
+        self._remove(key)
+        self.evicted += 1
+        metrics.inc("meme_session_memory_evictions_total")
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        session_id = key[0]
+        self._bytes -= entry[1]
+        self._sessions[session_id] -= entry[1]
+        if not any(k[0] == session_id for k in self._entries):
+            del self._sessions[session_id]
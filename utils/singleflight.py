@@ -0,0 +1,90 @@
+"""Process-wide coalescing of identical in-flight requests"""
+import threading
+from concurrent.futures import Future
+
+from utils import metrics
+
+
+class _Abandoned(Exception):
+    """The leading caller was cancelled before its call finished"""
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome
+
+    The first caller for a key (the leader) runs fn in its own thread.
+    Callers arriving while that call is in flight wait for the same result,
+    or the same exception, instead of repeating the work. If the leader is
+    cancelled (a BaseException such as a Streamlit rerun or Ctrl-C), the
+    waiters are released and one of them retries as the new leader. Nothing
+    is kept once a call finishes, so results are shared only between
+    overlapping callers and must be treated as read-only.
+    """
+
+    def __init__(self, name="singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def do(self, key, fn, timeout=None):
+        """Return fn(), sharing one execution among concurrent callers of key
+
+        timeout bounds how long a waiting caller blocks (raising
+        concurrent.futures.TimeoutError); the leader is never interrupted.
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = Future()
+                    self.calls += 1
+            if leader:
+                return self._lead(key, future, fn)
+
+            error = future.exception(timeout)
+            if isinstance(error, _Abandoned):
+                continue
+            with self._lock:
+                self.shared += 1
+            metrics.inc("meme_singleflight_saved_total", flight=self.name)
+            return future.result()
+
+    def _lead(self, key, future, fn):
+        try:
+            result = fn()
+        except Exception as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._forget(key)
+            with self._lock:
+                self.abandoned += 1
+            future.set_exception(_Abandoned())
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        # Drop the key before publishing the outcome so that late arrivals
+        # start a fresh call (or hit a cache) instead of a finished one.
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "saved": self.shared,
+                "abandoned": self.abandoned,
+                "in_flight": len(self._calls),
+            }
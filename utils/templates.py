@@ -0,0 +1,248 @@
+"""Ready-to-use template prompts and their background pre-rendering
+
+The warm-up job renders each template once per common preset/style pair
+into the shared image cache, so picking a template and generating with
+those settings is a cache hit, and stores small thumbnails for the
+gallery. Run it offline from the project root with:
+    python -m utils.templates [--presets ...] [--styles ...]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+from utils.atomic import atomic_open, write_atomic
+from utils.history import THUMBNAIL_FORMAT, make_thumbnail
+from utils.http_client import ImageHttpClient
+from utils.image_cache import DEFAULT_CACHE_DIR, ImageCache
+from utils.presets import SIZE_PRESETS
+from utils.render import decode_base_image, fetch_image_bytes, request_key
+
+DEFAULT_TEMPLATE_DIR = os.path.expanduser("~/.cache/ai_meme_creator/templates")
+TEMPLATE_THUMBNAIL_SIZE = (256, 256)
+
+# Combinations pre-rendered for every template (the sidebar defaults first)
+WARM_PRESETS = ("Instagram Post (1:1)", "Instagram Story")
+WARM_STYLES = ("Modern Minimal", "Bold & Colorful")
+
+# Categorized templates shown in the Templates tab
+TEMPLATE_CATEGORIES = {
+    "🎉 College Events": {
+        "Cultural Fest": "Vibrant college cultural festival poster with dancing silhouettes, colorful lights, stage performance, energetic crowd, modern design",
+        "Sports Day": "Dynamic sports event poster with athletes running, jumping, playing, stadium background, energetic action shots",
+        "Tech Fest": "Futuristic technology festival poster with circuit boards, robots, AI elements, holographic displays, cyberpunk style",
+        "Fresher's Party": "Fun and colorful fresher's welcome party poster with confetti, balloons, excited students, celebration theme",
+    },
+    "📚 Academic": {
+        "Workshop": "Professional workshop poster with learning elements, books, laptop, presentation screen, clean modern design",
+        "Seminar": "Elegant seminar poster with microphone, audience, professional setting, academic theme",
+        "Guest Lecture": "Sophisticated guest lecture poster with auditorium, speaker podium, formal academic atmosphere",
+        "Exam Motivation": "Motivational study poster with books, coffee, determined student, inspirational quotes background",
+    },
+    "🎭 Club Activities": {
+        "Music Club": "Musical performance poster with instruments, musical notes, stage lights, energetic concert vibe",
+        "Drama Club": "Theatrical performance poster with stage curtains, masks, spotlight, dramatic atmosphere",
+        "Photography Club": "Creative photography club poster with camera, lenses, beautiful landscapes, artistic composition",
+        "Coding Club": "Tech coding club poster with computer code, algorithms, matrix style, hacker aesthetic",
+    },
+    "😂 Fun Memes": {
+        "Study Life": "Relatable student studying late night with coffee, tired expression, messy desk, funny situation",
+        "Exam Stress": "Stressed student before exams, panic mode, surrounded by books, comedic expression",
+        "Campus Life": "Funny college daily life situation, students hanging out, casual campus setting",
+        "Assignment Deadline": "Student rushing to complete assignment, laptop, panic, funny deadline situation",
+    },
+    "📢 Announcements": {
+        "Registration Open": "Clean registration announcement poster with form icons, checkmarks, modern professional design",
+        "Competition": "Exciting competition announcement with trophy, podium, competitive elements, bold design",
+        "Deadline Notice": "Important deadline notice poster with clock, calendar, urgent warning style, clear information",
+        "Results Out": "Results announcement poster with grades, achievement symbols, celebration or suspense theme",
+    }
+}
+
+
+def iter_templates(categories=TEMPLATE_CATEGORIES):
+    """Yield (category, name, prompt) for every template"""
+    for category, templates in categories.items():
+        for name, prompt in templates.items():
+            yield category, name, prompt
+
+
+class TemplateWarmer:
+    """Pre-render templates into the image cache and keep gallery thumbnails
+
+    A manifest maps each (template, preset, style) entry to the request key
+    it was rendered with. That key covers the normalized template prompt,
+    the style mapping and the size, so a refresh only re-renders entries
+    whose prompt or style text changed, or whose base image was evicted.
+    """
+
+    def __init__(self, cache, client, thumb_dir=DEFAULT_TEMPLATE_DIR, presets=WARM_PRESETS,
+                 styles=WARM_STYLES, categories=TEMPLATE_CATEGORIES):
+        self.cache = cache
+        self.client = client
+        self.thumb_dir = thumb_dir
+        self.presets = presets
+        self.styles = styles
+        self.categories = categories
+        self.manifest_path = os.path.join(thumb_dir, "manifest.json")
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.running = False
+        self._lock = threading.Lock()
+        self._thumbnails = {}
+        self._thread = None
+        os.makedirs(thumb_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    @staticmethod
+    def entry_id(name, preset, style):
+        return f"{name}|{preset}|{style}"
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        with self._lock:
+            manifest = dict(self.manifest)
+        with atomic_open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+
+    def _thumb_path(self, key):
+        return os.path.join(self.thumb_dir, f"{key}.{THUMBNAIL_FORMAT.lower()}")
+
+    def entries(self):
+        """(entry_id, prompt, width, height, style, key) for every wanted render"""
+        for _, name, prompt in iter_templates(self.categories):
+            for preset in self.presets:
+                width, height = SIZE_PRESETS[preset]
+                for style in self.styles:
+                    yield (self.entry_id(name, preset, style), prompt, width, height, style,
+                           request_key(prompt, width, height, style))
+
+    def plan(self):
+        """Entries whose render is missing or out of date"""
+        return [
+            entry for entry in self.entries()
+            if self.manifest.get(entry[0]) != entry[5]
+            or not os.path.exists(self._thumb_path(entry[5]))
+            or not self.cache.contains(entry[5])
+        ]
+
+    def refresh(self, progress=None):
+        """Render every stale entry and drop thumbnails no entry points at any more"""
+        todo = self.plan()
+        with self._lock:
+            self.total, self.done, self.failed = len(todo), 0, 0
+            self.running = True
+        try:
+            for entry_id, prompt, width, height, style, key in todo:
+                try:
+                    data = fetch_image_bytes(prompt, width, height, style, cache=self.cache, client=self.client)
+                    image = decode_base_image(data, self.cache, key)
+                    thumbnail = make_thumbnail(image, TEMPLATE_THUMBNAIL_SIZE)
+                    write_atomic(self._thumb_path(key), thumbnail)
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    if progress:
+                        progress(entry_id, e)
+                    continue
+                with self._lock:
+                    self.manifest[entry_id] = key
+                    self._thumbnails[key] = thumbnail
+                    self.done += 1
+                self._save_manifest()
+                if progress:
+                    progress(entry_id, None)
+            self._prune()
+        finally:
+            with self._lock:
+                self.running = False
+        return {"rendered": self.done, "failed": self.failed, "up_to_date": len(list(self.entries())) - len(todo)}
+
+    def _prune(self):
+        wanted = {entry[0]: entry[5] for entry in self.entries()}
+        with self._lock:
+            self.manifest = {entry_id: key for entry_id, key in self.manifest.items() if wanted.get(entry_id) == key}
+            live = set(self.manifest.values())
+        self._save_manifest()
+        suffix = f".{THUMBNAIL_FORMAT.lower()}"
+        for name in os.listdir(self.thumb_dir):
+            if name.endswith(suffix) and name[:-len(suffix)] not in live:
+                try:
+                    os.remove(os.path.join(self.thumb_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def start(self):
+        """Refresh on a daemon thread (once; later calls are no-ops while it runs)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._thread = threading.Thread(target=self.refresh, name="template-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def thumbnail(self, name, preset, style):
+        """Thumbnail bytes for a warmed entry, or None"""
+        with self._lock:
+            key = self.manifest.get(self.entry_id(name, preset, style))
+            if key is None:
+                return None
+            if key in self._thumbnails:
+                return self._thumbnails[key]
+        try:
+            with open(self._thumb_path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._thumbnails[key] = data
+        return data
+
+    def any_thumbnail(self, name):
+        """Thumbnail for the first warmed preset/style of a template, or None"""
+        for preset in self.presets:
+            for style in self.styles:
+                data = self.thumbnail(name, preset, style)
+                if data is not None:
+                    return data
+        return None
+
+    def is_warm(self, name, preset, style):
+        """True if generating this template with preset/style will hit the cache"""
+        with self._lock:
+            key = self.manifest.get(self.entry_id(name, preset, style))
+        return key is not None and self.cache.contains(key)
+
+    def status(self):
+        with self._lock:
+            return {"total": self.total, "done": self.done, "failed": self.failed, "running": self.running}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render template prompts into the image cache")
+    parser.add_argument("--presets", nargs="+", default=list(WARM_PRESETS), choices=list(SIZE_PRESETS))
+    parser.add_argument("--styles", nargs="+", default=list(WARM_STYLES))
+    parser.add_argument("--cache-dir", default=os.environ.get("MEME_IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR))
+    parser.add_argument("--template-dir", default=os.environ.get("MEME_TEMPLATE_DIR", DEFAULT_TEMPLATE_DIR))
+    args = parser.parse_args(argv)
+
+    def progress(entry_id, error):
+        print(f"{entry_id}: {'FAILED: ' + str(error) if error else 'ok'}", file=sys.stderr, flush=True)
+
+    warmer = TemplateWarmer(ImageCache(args.cache_dir), ImageHttpClient(), args.template_dir,
+                            tuple(args.presets), tuple(args.styles))
+    result = warmer.refresh(progress)
+    print(f"✅ {result['rendered']} rendered, {result['up_to_date']} already up to date, {result['failed']} failed")
+    return 0 if result["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Fast outlined text renderer for poster and meme overlays"""
+from PIL import Image, ImageColor, ImageDraw, ImageFilter
+
+from utils.fonts import text_bbox
+
+
+def text_start_y(position, img_height, scale=1.0):
+    """Vertical start of the first text line for a text position"""
+    y_positions = {
+        "Top": round(40 * scale),
+        "Center": img_height // 2 - round(50 * scale),
+        "Bottom": img_height - round(150 * scale),
+    }
+    return y_positions.get(position, round(40 * scale))
+
+
+def _line_masks(text, font, bbox, outline_width, pad):
+    """Rasterize a line once with a native stroke and once without
+
+    Returns (outline_mask, fill_mask) as 'L' tiles sized to the line's
+    bounding box plus padding for the outline and shadow.
+    """
+    size = (bbox[2] - bbox[0] + 2 * pad, bbox[3] - bbox[1] + 2 * pad)
+    origin = (pad - bbox[0], pad - bbox[1])
+    fill_mask = Image.new("L", size, 0)
+    ImageDraw.Draw(fill_mask).text(origin, text, font=font, fill=255)
+    if outline_width <= 0:
+        return fill_mask, fill_mask
+    outline_mask = Image.new("L", size, 0)
+    ImageDraw.Draw(outline_mask).text(origin, text, font=font, fill=255,
+                                      stroke_width=outline_width, stroke_fill=255)
+    return outline_mask, fill_mask
+
+
+class TextOverlay:
+    """Transparent text layer kept as small RGBA tiles, one per line
+
+    Tiles hold straight (non-premultiplied) colors, so pasting a tile
+    through its own alpha is a standard "over" composite.
+    """
+
+    def __init__(self, size, tiles):
+        self.size = size
+        self.tiles = tiles
+
+    def apply(self, image, in_place=False):
+        """Return a copy of image with the text composited on top
+
+        in_place=True draws onto image itself (RGB or RGBA) instead.
+        """
+        if in_place and image.mode in ("RGB", "RGBA"):
+            img = image
+        else:
+            img = image.copy() if image.mode in ("RGB", "RGBA") else image.convert("RGB")
+        for box, tile in self.tiles:
+            if img.mode == "RGBA":
+                _composite_clipped(img, tile, box)
+            else:
+                img.paste(tile, box, tile)
+        return img
+
+
+def _composite_clipped(img, tile, box):
+    left, top = max(0, box[0]), max(0, box[1])
+    right = min(img.width, box[0] + tile.width)
+    bottom = min(img.height, box[1] + tile.height)
+    if right <= left or bottom <= top:
+        return
+    img.alpha_composite(tile.crop((left - box[0], top - box[1], right - box[0], bottom - box[1])), (left, top))
+
+
+def _ink_layer(color, mask):
+    layer = Image.new("RGBA", mask.size, color)
+    layer.putalpha(mask)
+    return layer
+
+
+def build_text_overlay(size, texts, position, text_color, outline_color, outline_width=3,
+                       shadow=False, shadow_radius=6, shadow_offset=(4, 4), shadow_opacity=0.6,
+                       line_spacing=20, scale=1.0):
+    """Render centered, outlined text lines into a TextOverlay for an image of size
+
+    Each line is rasterized into small glyph masks once, the outline comes
+    from the font's native stroke, and the shadow, outline and fill are
+    stacked into one RGBA tile. An optional soft shadow is a blurred copy
+    of the outline mask. Pixel offsets are multiplied by scale so previews
+    match the full render.
+    """
+    if scale != 1.0:
+        outline_width = max(1, round(outline_width * scale)) if outline_width > 0 else 0
+        shadow_radius = max(1, round(shadow_radius * scale))
+        shadow_offset = (round(shadow_offset[0] * scale), round(shadow_offset[1] * scale))
+        line_spacing = round(line_spacing * scale)
+    text_ink = ImageColor.getcolor(text_color, "RGBA")
+    outline_ink = ImageColor.getcolor(outline_color, "RGBA")
+    pad = outline_width + (2 * shadow_radius + max(abs(shadow_offset[0]), abs(shadow_offset[1])) if shadow else 0)
+
+    img_width, img_height = size
+    current_y = text_start_y(position, img_height, scale)
+    tiles = []
+
+    for text_content, use_font in texts:
+        if not text_content:
+            continue
+
+        text_upper = text_content.upper()
+        bbox = text_bbox(text_upper, use_font)
+        text_width = bbox[2] - bbox[0]
+        x = (img_width - text_width) // 2
+        box = (x + bbox[0] - pad, current_y + bbox[1] - pad)
+
+        outline_mask, fill_mask = _line_masks(text_upper, use_font, bbox, outline_width, pad)
+
+        tile = Image.new("RGBA", fill_mask.size, (0, 0, 0, 0))
+        if shadow:
+            blurred = outline_mask.filter(ImageFilter.GaussianBlur(shadow_radius))
+            shadow_mask = Image.new("L", fill_mask.size, 0)
+            shadow_mask.paste(blurred.point(lambda v: int(v * shadow_opacity)), shadow_offset)
+            tile = Image.alpha_composite(tile, _ink_layer((0, 0, 0, 255), shadow_mask))
+        if outline_width > 0:
+            tile = Image.alpha_composite(tile, _ink_layer(outline_ink, outline_mask))
+        tile = Image.alpha_composite(tile, _ink_layer(text_ink, fill_mask))
+        tiles.append((box, tile))
+        current_y += bbox[3] - bbox[1] + line_spacing
+
+    return TextOverlay(size, tiles)
+
+
+def render_text(image, texts, position, text_color, outline_color, outline_width=3,
+                shadow=False, shadow_radius=6, shadow_offset=(4, 4), shadow_opacity=0.6,
+                line_spacing=20, scale=1.0):
+    """Draw centered, outlined text lines onto a copy of image"""
+    overlay = build_text_overlay(image.size, texts, position, text_color, outline_color, outline_width,
+                                 shadow, shadow_radius, shadow_offset, shadow_opacity, line_spacing, scale)
+    return overlay.apply(image)
@@ -0,0 +1,35 @@
+"""Concurrent generation of seeded image variations"""
+import contextvars
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Max upstream requests a single session may have in flight at once
+VARIATION_CONCURRENCY = 4
+
+
+def random_seeds(count):
+    """Return distinct random seeds for a batch of variations"""
+    return random.sample(range(1, 2**31), count)
+
+
+def generate_variations(generate_fn, seeds, max_workers=VARIATION_CONCURRENCY):
+    """Run generate_fn(seed) concurrently and yield results as they arrive
+
+    Yields (index, seed, image, error) tuples in completion order, so the
+    caller can fill in a grid progressively. A failed variation yields its
+    exception instead of stopping the batch.
+    """
+    if not seeds:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(seeds), max_workers)) as pool:
+        # Copy the caller's context so per-render traces see worker stages
+        futures = {
+            pool.submit(contextvars.copy_context().run, generate_fn, seed): (idx, seed)
+            for idx, seed in enumerate(seeds)
+        }
+        for future in as_completed(futures):
+            idx, seed = futures[future]
+            try:
+                yield idx, seed, future.result(), None
+            except Exception as e:
+                yield idx, seed, None, e